@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+## Benchmark of the analysis pipeline
+#  Generates a synthetic results tree (see synthetic_results.py) and times
+#  each stage of the analysis on it: parsing, the parse cache, loading a
+#  results folder, building DataFrames and evaluating metrics. Every stage
+#  is run `--repeat` times and the best time is reported. A separate run
+#  under tracemalloc reports the peak of the memory allocated by the stage
+#  (python objects and numpy arrays of this process, not of the workers).
+#  Everything runs offline in a temporary directory with its own parse
+#  cache.
+#
+#  python3 benchmark_analysis.py --runs 32 --dumps 20 --json bench.json
+#  python3 benchmark_analysis.py --runs 32 --dumps 20 --baseline bench.json
+#
+#  With `--baseline` the exit code is 1 if a stage got slower than the
+#  baseline by more than `--tolerance`.
+
+import argparse
+import gc
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from os import path
+
+import gem5_utils as gu
+import synthetic_results
+
+
+def _clear_cache():
+    shutil.rmtree(gu.stats_cache_dir(), ignore_errors=True)
+    os.makedirs(gu.stats_cache_dir())
+    gu.clear_config_ini_cache()
+
+
+def stages(args, result_dir):
+    ## (name, setup, stage) in pipeline order. `setup` runs untimed before
+    #  each repetition and its result is passed to `stage`.
+    outdirs = sorted(path.join(result_dir, d) for d in os.listdir(result_dir))
+    fields = [("Cycles", "cycles"), ("Instructions", "insts"), ("CPI", "cpi"),
+              ("L1D MPKI", "mpki_l1d"), ("L2 MPKI", "mpki_l2")]
+    regex = r"system\.cpu(?P<cpu>\d+)\.(?P<cache>icache|dcache|l2cache)\.overallMisses::total"
+    loaded = lambda: [gu.parse_result(d) for d in outdirs]
+
+    result = [
+        ("read_stats", None,
+         lambda _: [gu.read_stats(d, "stats.txt") for d in outdirs]),
+        ("read_stats keys", None,
+         lambda _: [gu.read_stats(d, "stats.txt", keys=["system.cpu1.*"]) for d in outdirs]),
+        ("find_stats_group cold", _clear_cache,
+         lambda _: gu.find_stats_group(result_dir, workers=args.workers)),
+        ("find_stats_group warm", None,
+         lambda _: gu.find_stats_group(result_dir, workers=args.workers)),
+        ("find_stats dump=-1", None,
+         lambda _: [gu.find_stats(d, dump=-1) for d in outdirs]),
+        ("parse_result", None, lambda _: loaded()),
+        ("to_pandas", loaded, lambda results: gu.to_pandas(results, fields, dump=-1)),
+        ("to_pandas lambdas", loaded, lambda results: gu.to_pandas(results, [
+            ("Cycles", lambda r: r.stats[-1]["system.cpu1.numCycles"], int),
+            ("CPI", lambda r: r.stats[-1]["system.cpu1.numCycles"] / r.stats[-1]["system.cpu1.numInsts"],
+             float)])),
+        ("ResultSet metrics", loaded,
+         lambda results: gu.ResultSet(results, dump=-1).to_pandas([f for _, f in fields])),
+        ("select_stats", loaded, lambda results: gu.select_stats(results, regex)),
+        ("invocation_stats", loaded, lambda results: gu.invocation_stats(results)),
+        ("results_table", lambda: gu.clear_config_ini_cache(),
+         lambda _: gu.results_table(result_dir, ["system.cpu1.type", "system.cpu*.dcache.size"],
+                                    ["cpi", "mpki_l1d"], dump=-1, workers=args.workers)),
+    ]
+    if args.pyparsing:
+        result.insert(0, ("read_stats pyparsing x1", None,
+                          lambda _: gu.read_stats(outdirs[0], "stats.txt", fast=False)))
+    return result
+
+
+def measure(setup, stage, repeat):
+    ## Best wall time of `repeat` runs and the traced peak memory of one more.
+    times = []
+    for _ in range(repeat):
+        data = setup() if setup else None
+        gc.collect()
+        start = time.perf_counter()
+        stage(data)
+        times.append(time.perf_counter() - start)
+    data = setup() if setup else None
+    gc.collect()
+    tracemalloc.start()
+    stage(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def compare(results, baseline, tolerance):
+    ## Stages that got slower than the baseline by more than `tolerance`.
+    slower = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base and r["seconds"] > base["seconds"] * (1 + tolerance):
+            slower.append((name, base["seconds"], r["seconds"]))
+    return slower
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark the gem5 analysis pipeline")
+    parser.add_argument("--runs", type=int, default=16, help="Number of synthetic runs")
+    parser.add_argument("--dumps", type=int, default=20, help="Stats dumps per run")
+    parser.add_argument("--keys", type=int, default=3000, help="Stats lines per dump")
+    parser.add_argument("--distributions", type=int, default=20, help="Distributions per dump")
+    parser.add_argument("--workers", type=int, default=4, help="Workers of the process pool stages")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per stage")
+    parser.add_argument("--pyparsing", action="store_true", help="Include the pyparsing parser")
+    parser.add_argument("--only", type=str, default="", help="Comma separated stages to run")
+    parser.add_argument("--json", type=str, help="Write the results to this file")
+    parser.add_argument("--baseline", type=str, help="Compare with results written by --json")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown against the baseline (0.25 = 25%%)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    work_dir = tempfile.mkdtemp(prefix="gem5_bench_")
+    os.environ["GEM5_STATS_CACHE"] = path.join(work_dir, "cache")
+    result_dir = path.join(work_dir, "results")
+    results = {}
+    try:
+        start = time.perf_counter()
+        synthetic_results.generate_results(result_dir, args.runs, args.dumps, args.keys,
+                                           args.distributions)
+        size = sum(path.getsize(path.join(d, "stats.txt")) for d in
+                   (path.join(result_dir, s) for s in os.listdir(result_dir)))
+        print("Generated {} runs x {} dumps, {:.1f} MB stats in {:.1f} s".format(
+            args.runs, args.dumps, size / 1e6, time.perf_counter() - start))
+        _clear_cache()
+
+        only = [s for s in args.only.split(",") if s]
+        print("{:<25} {:>12} {:>14}".format("stage", "seconds", "peak MB"))
+        for name, setup, stage in stages(args, result_dir):
+            if only and name not in only:
+                continue
+            seconds, peak = measure(setup, stage, args.repeat)
+            results[name] = {"seconds": seconds, "peak_bytes": peak}
+            print("{:<25} {:>12.4f} {:>14.1f}".format(name, seconds, peak / 1e6))
+        print("Max RSS: {:.1f} MB".format(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    config = {k: getattr(args, k) for k in ("runs", "dumps", "keys", "distributions", "workers")}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": config, "stages": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["config"] != config:
+            print("Warning: baseline was measured with {}".format(baseline["config"]))
+        slower = compare(results, baseline["stages"], args.tolerance)
+        for name, before, after in slower:
+            print("Regression: {} {:.4f} s -> {:.4f} s".format(name, before, after))
+        sys.exit(1 if slower else 0)
@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
 from itertools import count
+import mmap
 import os
 import re
 import argparse
 
+from gem5_stats import find_result_file, open_result_file
+
 ROOT = os.path.abspath(os.path.dirname(os.path.realpath(__file__)) + "/../")
 
 
@@ -17,6 +20,85 @@ def prRed(skk): print("\033[91m {}\033[00m" .format(skk))
 def prGreen(skk): print("\033[92m {}\033[00m" .format(skk))
 
 
+CMD_MARKER = b"command line: "
+DONE_MARKER = b"Simulation done"
+INVOCATION_MARKER = b"End invokation:"
+HEAD_SIZE = 1 << 16
+STREAM_CHUNK = 1 << 22
+
+
+def count_marker(data, marker, end):
+    ## Number of `marker` in data[:end] using the byte search of data.
+    n, pos = 0, data.find(marker, 0, end)
+    while pos >= 0:
+        n += 1
+        pos = data.find(marker, pos + len(marker), end)
+    return n
+
+
+def scan_log(data):
+    ## Returns (command line, success, invocations) of a gem5.log given as
+    #  bytes or mmap. The command line is in the head and the completion
+    #  marker at the tail, rfind searches backwards from the end. Only the
+    #  invocations before the completion marker are counted.
+    cmd = ""
+    head = data[:HEAD_SIZE]
+    pos = head.find(CMD_MARKER)
+    if pos >= 0:
+        cmd = head[pos + len(CMD_MARKER):].split(b"\n", 1)[0].decode(errors="replace").strip()
+    done = data.rfind(DONE_MARKER)
+    end = done if done >= 0 else len(data)
+    return cmd, done >= 0, count_marker(data, INVOCATION_MARKER, end)
+
+
+def find_markers(data, marker, start):
+    ## Positions of `marker` in data that end after `start`.
+    result, pos = [], data.find(marker, max(0, start - len(marker) + 1))
+    while pos >= 0:
+        result.append(pos)
+        pos = data.find(marker, pos + len(marker))
+    return result
+
+
+def scan_stream(f):
+    ## Same as scan_log for a file that can only be read front to back, like
+    #  a compressed log. The file is read in chunks of STREAM_CHUNK bytes and
+    #  the last bytes of a chunk are carried over so markers that straddle two
+    #  chunks are found. The invocations before the last completion marker
+    #  are remembered while counting on.
+    data = f.read(HEAD_SIZE)
+    cmd = ""
+    pos = data.find(CMD_MARKER)
+    if pos >= 0:
+        cmd = data[pos + len(CMD_MARKER):].split(b"\n", 1)[0].decode(errors="replace").strip()
+    keep = max(len(DONE_MARKER), len(INVOCATION_MARKER)) - 1
+    count, done, tail = 0, None, b""
+    while data:
+        data = tail + data
+        invocations = find_markers(data, INVOCATION_MARKER, len(tail))
+        for d in find_markers(data, DONE_MARKER, len(tail)):
+            done = count + sum(1 for i in invocations if i < d)
+        count += len(invocations)
+        tail = data[-keep:]
+        data = f.read(STREAM_CHUNK)
+    return cmd, done is not None, count if done is None else done
+
+
+def check_log(result_dir):
+    filename = find_result_file(result_dir, "gem5.log")
+    if filename is None:
+        return None
+    if os.path.getsize(filename) == 0:
+        return "", False, 0
+    ## Compressed logs can not be mapped and are decompressed in chunks.
+    if not filename.endswith("gem5.log"):
+        with open_result_file(result_dir, "gem5.log") as f:
+            return scan_stream(f)
+    with open(filename, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return scan_log(data)
+
+
 
 args = parse_arguments()
 subdirs = [s for s in os.listdir(args.dir) if os.path.isdir(args.dir + s)]
@@ -28,34 +110,22 @@ results = []
 
 for subdir in subdirs[:]:
     filename = "{}/{}/gem5.log".format(args.dir,subdir)
-    cmd = ""
-    success = False
-
-    if os.path.exists(filename):
-        with open(filename) as f:
-            start_tick = 0
-            count = 0
-            for line in f:
-                if line[:14] == "command line: ":
-                    cmd = line[14:].strip()
-                # if "'fwait'" in line:
-                #     print("{} stopped with 'fwait'".format(subdir))
-                if "Simulation done" in line:
-                    success = True
-                    break
-                if "End invokation:" in line:
-                    count += 1
-
-            if success:
-                if count < 20:
-                    status = "\033[93m WARN\033[00m"
-                else:
-                    status = "\033[92m succeed\033[00m"
 
+    ## The log might be compressed (gem5.log.gz/.xz/.zst)
+    log = check_log(os.path.join(args.dir, subdir))
+    if log is not None:
+        cmd, success, count = log
+
+        if success:
+            if count < 20:
+                status = "\033[93m WARN\033[00m"
             else:
-                status= "\033[91m fail\033[00m"
-            print(f"{subdir:>25} > {count} : {status}")
-            rerun_cmds += [(success, f"{cmd} > {filename} 2>&1 &")]
+                status = "\033[92m succeed\033[00m"
+
+        else:
+            status= "\033[91m fail\033[00m"
+        print(f"{subdir:>25} > {count} : {status}")
+        rerun_cmds += [(success, f"{cmd} > {filename} 2>&1 &")]
 
 total = len(rerun_cmds) -1
 with open("rerun.sh", "w") as f:
@@ -0,0 +1,987 @@
+#!/usr/bin/python
+# -*- coding: UTF8 -*-
+## Parsing core of gem5_utils
+#  Reading, caching and indexing of gem5 stats files. Only needs numpy so
+#  scripts that just read a few stats start fast; pandas and pyparsing are
+#  imported when a function needs them. Everything here is also available
+#  through gem5_utils.
+import json
+
+import collections
+import collections.abc
+import concurrent.futures
+import gzip
+import hashlib
+import io
+import lzma
+import mmap
+import os
+import re
+import struct
+import time
+import numpy as np
+from os import path, listdir, stat
+
+__all__ = ["Distribution", "StatsVector", "StatsDump", "StatsStore", "COMPRESSED_SUFFIXES",
+           "find_result_file", "open_result_file", "StatsFollower", "follow_stats", "read_stats",
+           "STATS_PARSER_VERSION", "stats_cache_dir", "index_stats", "read_stats_dump",
+           "read_stats_hdf5", "find_stats", "find_stats_group"]
+
+
+def _is_int_value(value):
+    return value.lstrip('-').isdigit() and len(value) < 19
+
+
+def _float_value(value):
+    ## Percentages are kept as float without the '%'. Unparsable values
+    #  become nan.
+    try:
+        return float(value.rstrip('%'))
+    except ValueError:
+        return float('nan')
+
+
+class Distribution:
+    ## A gem5 distribution or histogram stat as arrays.
+    #  `counts` holds the bucket counts with the buckets along the last axis
+    #  and one row per dump (or run) along the leading axes. Bucket `i` covers
+    #  the values `low[i]`..`high[i]`. The summary stats gem5 prints for the
+    #  distribution (samples, mean, stdev, underflows, ...) are arrays over the
+    #  leading axes and None if not printed.
+    SUMMARY = ("samples", "mean", "gmean", "stdev", "underflows", "overflows",
+               "min_value", "max_value", "total")
+
+    def __init__(self, name, low, high, counts, **summary):
+        self.name = name
+        self.low = np.asarray(low, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.counts = np.asarray(counts)
+        for field in self.SUMMARY:
+            setattr(self, field, summary.get(field))
+
+    def __getitem__(self, index):
+        ## Select rows, e.g. a single dump.
+        summary = {field: getattr(self, field)[index] for field in self.SUMMARY
+                   if getattr(self, field) is not None}
+        return Distribution(self.name, self.low, self.high, self.counts[index], **summary)
+
+    @property
+    def edges(self):
+        ## Bucket boundaries. Buckets are contiguous so bucket `i` spans
+        #  edges[i] to edges[i + 1].
+        width = self.low[1] - self.high[0] if len(self.low) > 1 else 1.
+        return np.append(self.low, self.high[-1] + width)
+
+    def pdf(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.counts / self.counts.sum(axis=-1, keepdims=True)
+
+    def cdf(self):
+        return np.cumsum(self.pdf(), axis=-1)
+
+    def percentile(self, q):
+        ## The q-th percentile (0-100) of each row interpolated linearly
+        #  within the bucket it falls into. nan for rows without samples,
+        #  e.g. a dump or run without this distribution.
+        cdf = self.cdf()
+        q = q / 100.
+        i = np.minimum((cdf < q).sum(axis=-1), len(self.low) - 1)
+        i = np.expand_dims(i, -1)
+        upper = np.take_along_axis(cdf, i, -1)
+        lower = np.where(i > 0, np.take_along_axis(cdf, np.maximum(i - 1, 0), -1), 0.)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frac = np.clip(np.nan_to_num((q - lower) / (upper - lower)), 0., 1.)
+        edges = self.edges
+        value = edges[i] + frac * (edges[i + 1] - edges[i])
+        empty = ~(self.counts.sum(axis=-1) > 0)
+        return np.where(empty, np.nan, value[..., 0])[()]
+
+    @classmethod
+    def stack(cls, distributions):
+        ## Stack distributions with equal buckets, e.g. of many runs, along a
+        #  new leading axis.
+        first = distributions[0]
+        for d in distributions[1:]:
+            if not (np.array_equal(d.low, first.low) and np.array_equal(d.high, first.high)):
+                raise ValueError("{}: buckets differ between distributions".format(first.name))
+        summary = {field: np.stack([getattr(d, field) for d in distributions]) for field in cls.SUMMARY
+                   if all(getattr(d, field) is not None for d in distributions)}
+        return cls(first.name, first.low, first.high,
+                   np.stack([d.counts for d in distributions]), **summary)
+
+
+StatsVector = collections.namedtuple("StatsVector", ["name", "subnames", "values"])
+
+
+_BUCKET = re.compile(r'^(-?[0-9.]+)(?:-(-?[0-9.]+))?$')
+
+
+class StatsDump(collections.abc.Mapping):
+    ## Read only key -> value view on a single dump of a `StatsStore`.
+    def __init__(self, store, dump):
+        self.store = store
+        self.dump = dump
+
+    def __getitem__(self, key):
+        pos, values, col = self.store.index[key]
+        if not self.store.present[self.dump, pos]:
+            raise KeyError(key)
+        return values[self.dump, col].item()
+
+    def get(self, key, default=None):
+        ## Single index lookup instead of the `in` + `[]` of Mapping.get.
+        entry = self.store.index.get(key)
+        if entry is None or not self.store.present[self.dump, entry[0]]:
+            return default
+        return entry[1][self.dump, entry[2]].item()
+
+    def group(self, name):
+        ## All stats `name::<sub name>` as `Distribution` or `StatsVector`.
+        group = self.store.group(name)
+        return None if group is None else group[self.dump] if isinstance(group, Distribution) else \
+            StatsVector(group.name, group.subnames, group.values[self.dump])
+
+    def __iter__(self):
+        present = self.store.present[self.dump]
+        return (key for key, p in zip(self.store.keys, present) if p)
+
+    def __len__(self):
+        return int(self.store.present[self.dump].sum())
+
+
+class StatsStore(collections.abc.Sequence):
+    ## Columnar, typed stats of all dumps of one run.
+    #  All dumps share one key table. Integer stats are held in an int64 and
+    #  all others in a float64 matrix of shape (dumps, keys). `present` marks
+    #  which key was written in which dump. On disk the matrices are stored
+    #  raw after a small json header so `load` can memory map them without
+    #  copying.
+    MAGIC = b'GEM5COLS'
+    ALIGN = 64
+
+    def __init__(self, keys, is_int, ints, floats, present, source=None, filename=None):
+        self.keys = keys
+        self.is_int = is_int
+        self.ints = ints
+        self.floats = floats
+        self.present = present
+        self.source = source
+        ## Set if the store is memory mapped from this file.
+        self.filename = filename
+        self._index = None
+        self._groups = None
+        self._matches = {}
+
+    def __reduce__(self):
+        ## A memory mapped store is sent to other processes by its file name
+        #  only. The receiver maps the same file instead of copying the data.
+        #  The parse cache may have evicted the file while it is mapped, then
+        #  the arrays are sent.
+        if self.filename is not None and path.isfile(self.filename):
+            return (StatsStore.load, (self.filename,))
+        return (StatsStore, (self.keys, self.is_int, self.ints, self.floats,
+                             self.present, self.source))
+
+    @property
+    def index(self):
+        ## key -> (key position, value matrix, column in that matrix)
+        if self._index is None:
+            int_col = np.cumsum(self.is_int) - 1
+            float_col = np.cumsum(~self.is_int) - 1
+            self._index = {key: (pos, self.ints, int(int_col[pos])) if is_int else
+                                (pos, self.floats, int(float_col[pos]))
+                           for pos, (key, is_int) in enumerate(zip(self.keys, self.is_int))}
+        return self._index
+
+    def __len__(self):
+        return self.present.shape[0]
+
+    def columns(self, keys):
+        ## Values of the given keys as float64 array of shape (dumps, keys).
+        #  Missing stats are nan.
+        values = np.full((len(self), len(keys)), np.nan)
+        for i, key in enumerate(keys):
+            entry = self.index.get(key)
+            if entry is not None:
+                pos, matrix, col = entry
+                values[:, i] = np.where(self.present[:, pos], matrix[:, col], np.nan)
+        return values
+
+    @property
+    def groups(self):
+        ## name -> [(sub name, key)] for all keys of the form `name::<sub name>`.
+        if self._groups is None:
+            self._groups = collections.defaultdict(list)
+            for key in self.keys:
+                name, sep, sub = key.partition('::')
+                if sep:
+                    self._groups[name].append((sub, key))
+        return self._groups
+
+    def group(self, name):
+        ## Returns the stats `name::<sub name>` over all dumps as `Distribution`
+        #  if they have samples or buckets and as `StatsVector` otherwise.
+        members = self.groups.get(name)
+        if not members:
+            return None
+        subs = dict(members)
+        buckets = [(m, key) for m, key in ((_BUCKET.match(sub), key) for sub, key in members) if m]
+        if "samples" not in subs:
+            names = [sub for sub, _ in members]
+            return StatsVector(name, names, self.columns([key for _, key in members]))
+
+        low = [float(m.group(1)) for m, _ in buckets]
+        high = [float(m.group(2) or m.group(1)) for m, _ in buckets]
+        counts = self.columns([key for _, key in buckets])
+        summary = {field: self.columns([subs[field]])[:, 0]
+                   for field in Distribution.SUMMARY if field in subs}
+        return Distribution(name, low, high, counts, **summary)
+
+    def matches(self, regex):
+        ## Keys fully matching `regex` with their captured groups. The regex
+        #  runs once over the key table and the result is kept for all dumps.
+        if regex not in self._matches:
+            r = re.compile(regex)
+            self._matches[regex] = [(key, m.groups() or (key,)) for key in self.keys
+                                    for m in (r.fullmatch(key),) if m]
+        return self._matches[regex]
+
+    def frame(self, regex, dumps=None):
+        ## DataFrame of the stats matching `regex` indexed by (dump, captured
+        #  groups). Stats not written in a dump are left out.
+        found = self.matches(regex)
+        dumps = np.arange(len(self)) if dumps is None else np.asarray(dumps, dtype=np.intp) % len(self)
+        pos = np.array([self.index[key][0] for key, _ in found], dtype=np.intp)
+        values = self.columns([key for key, _ in found])[dumps]
+        present = self.present[dumps][:, pos].ravel()
+        levels = [np.repeat(dumps, len(found))]
+        for i in range(len(found[0][1]) if found else 0):
+            levels.append(np.tile(np.array([groups[i] for _, groups in found], dtype=object), len(dumps)))
+        return _stats_frame(re.compile(regex), zip(*[level[present] for level in levels]),
+                            values.ravel()[present])
+
+    def __getitem__(self, dump):
+        if dump < 0:
+            dump += len(self)
+        if not 0 <= dump < len(self):
+            raise IndexError("dump index out of range")
+        return StatsDump(self, dump)
+
+    @classmethod
+    def from_dumps(cls, dumps, source=None):
+        ## Build the store from dumps given as key -> value string mappings.
+        #  Each dump is converted to typed arrays right away so its strings
+        #  can be freed before the next one is parsed.
+        positions = {}
+        rows = []
+        for dump in dumps:
+            cols = np.fromiter((positions.setdefault(key, len(positions)) for key in dump),
+                               dtype=np.intp, count=len(dump))
+            values = list(dump.values())
+            flags = [_is_int_value(v) for v in values]
+            ints = np.array([int(v) if f else 0 for v, f in zip(values, flags)], dtype=np.int64)
+            floats = np.array([0. if f else _float_value(v) for v, f in zip(values, flags)], dtype=np.float64)
+            rows.append((cols, np.array(flags, dtype=bool), ints, floats))
+
+        n, m = len(rows), len(positions)
+        present = np.zeros((n, m), dtype=bool)
+        all_ints = np.zeros((n, m), dtype=np.int64)
+        all_floats = np.full((n, m), np.nan)
+        is_int = np.ones(m, dtype=bool)
+        for dump, (cols, flags, ints, floats) in enumerate(rows):
+            present[dump, cols] = True
+            all_ints[dump, cols] = ints
+            all_floats[dump, cols] = np.where(flags, ints, floats)
+            is_int[cols[~flags]] = False
+        return cls(list(positions), is_int, all_ints[:, is_int], all_floats[:, ~is_int], present, source)
+
+    def select(self, keys=None, patterns=None):
+        ## Returns a new in memory store holding only the matching keys.
+        match = _key_matcher(keys, patterns)
+        if match is None:
+            return self
+        pos = np.array([i for i, key in enumerate(self.keys) if match(key)], dtype=np.intp)
+        is_int = self.is_int[pos]
+        int_col = np.cumsum(self.is_int) - 1
+        float_col = np.cumsum(~self.is_int) - 1
+        return StatsStore([self.keys[i] for i in pos], is_int,
+                          self.ints[:, int_col[pos[is_int]]],
+                          self.floats[:, float_col[pos[~is_int]]],
+                          self.present[:, pos], self.source)
+
+    def save(self, filename):
+        arrays = {"is_int": self.is_int, "ints": self.ints,
+                  "floats": self.floats, "present": self.present}
+        offsets = {}
+        size = 0
+        for name, a in arrays.items():
+            offsets[name] = [a.dtype.str, a.shape, size]
+            size += -(-a.nbytes // self.ALIGN) * self.ALIGN
+        header = json.dumps({"keys": self.keys, "source": self.source, "arrays": offsets}).encode()
+        start = -(-(len(self.MAGIC) + 8 + len(header)) // self.ALIGN) * self.ALIGN
+
+        ## Write to a temporary file first so readers never see a partial store.
+        tmp = "{}.{}.tmp".format(filename, os.getpid())
+        with open(tmp, 'wb') as f:
+            f.write(self.MAGIC + struct.pack('<Q', len(header)) + header)
+            for name, a in arrays.items():
+                f.seek(start + offsets[name][2])
+                f.write(np.ascontiguousarray(a).tobytes())
+            f.truncate(start + size)
+        os.replace(tmp, filename)
+        self.filename = filename
+
+    @classmethod
+    def load(cls, filename):
+        ## Memory map a store written by `save`.
+        with open(filename, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if data[:len(cls.MAGIC)] != cls.MAGIC:
+            raise ValueError("{} is not a stats store".format(filename))
+        n = struct.unpack_from('<Q', data, len(cls.MAGIC))[0]
+        header_end = len(cls.MAGIC) + 8 + n
+        header = json.loads(data[len(cls.MAGIC) + 8:header_end])
+        start = -(-header_end // cls.ALIGN) * cls.ALIGN
+        arrays = {}
+        for name, (dt, shape, offset) in header["arrays"].items():
+            arrays[name] = np.frombuffer(data, dtype=np.dtype(dt), count=int(np.prod(shape)),
+                                         offset=start + offset).reshape(shape)
+        return cls(header["keys"], arrays["is_int"], arrays["ints"], arrays["floats"],
+                   arrays["present"], header["source"], filename)
+
+
+def _stats_frame(regex, index, values):
+    ## Index levels are named after the named groups of the regex, other
+    #  groups are numbered. Without groups the level holds the stat name.
+    import pandas as pd
+    names = {i: name for name, i in regex.groupindex.items()}
+    levels = ["dump"] + ([names.get(i, "group{}".format(i)) for i in range(1, regex.groups + 1)]
+                         if regex.groups else ["stat"])
+    index = list(index)
+    return pd.DataFrame({"value": np.asarray(values, dtype=np.float64)},
+                        index=pd.MultiIndex.from_tuples(index, names=levels) if index else
+                        pd.MultiIndex.from_arrays([[]] * len(levels), names=levels))
+
+
+## Fast path for stats.txt parsing.
+#  A stat line is a key, whitespace and a value. Values are numbers with an
+#  optional sign, exponent and '%', nan or inf (_STAT_VALUE is shared with the
+#  pyparsing grammar below). Matching the whole dump with one compiled regex
+#  instead of running pyparsing on each line gives the same result and is
+#  more than 10x faster on large O3 stats files.
+_STAT_VALUE = r'[-+]?(?:inf(?!\S)|[0-9na.%]+(?:e[-+]?[0-9]+)?)'
+_STAT_LINE = re.compile(r'^[ \t\r]*(\S+)[ \t\r]+(' + _STAT_VALUE + ')', re.M)
+_END_MARKER = b'End Simulation Statistics'
+
+
+def _dump_offsets(data):
+    ## Returns the (start, end) byte offsets of every dump in `data` (bytes or
+    #  mmap). A dump ends with the line holding the end marker; trailing lines
+    #  after the last marker form their own dump.
+    offsets = []
+    start = 0
+    while True:
+        end = data.find(_END_MARKER, start)
+        if end < 0:
+            break
+        eol = data.find(b'\n', end)
+        eol = len(data) if eol < 0 else eol + 1
+        offsets.append((start, eol))
+        start = eol
+    if start < len(data):
+        offsets.append((start, len(data)))
+    return offsets
+
+
+## Compressed result files
+#  Finished result directories are often compressed. All readers look for
+#  `<file>`, `<file>.gz`, `<file>.xz` and `<file>.zst` (in this order) and
+#  decompress them on the fly chunk by chunk. zstd needs the optional
+#  `zstandard` package.
+COMPRESSED_SUFFIXES = ("", ".gz", ".xz", ".zst")
+
+
+def find_result_file(result_dir, file_name):
+    ## Returns the path of the plain or compressed variant of the file or
+    #  None if none exists.
+    for suffix in COMPRESSED_SUFFIXES:
+        filename = path.join(result_dir, file_name + suffix)
+        if path.isfile(filename):
+            return filename
+    return None
+
+
+def _is_compressed(filename):
+    return filename.endswith(COMPRESSED_SUFFIXES[1:])
+
+
+def open_result_file(result_dir, file_name):
+    ## Open the plain or compressed variant of the file as binary stream.
+    filename = find_result_file(result_dir, file_name)
+    if filename is None:
+        raise FileNotFoundError("No such file: '{}'".format(path.join(result_dir, file_name)))
+    if filename.endswith(".gz"):
+        return gzip.open(filename, 'rb')
+    if filename.endswith(".xz"):
+        return lzma.open(filename, 'rb')
+    if filename.endswith(".zst"):
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(open(filename, 'rb'), closefd=True)
+    return open(filename, 'rb')
+
+
+def _iter_dumps(stream, chunk_size=1 << 22):
+    ## Yield the raw bytes of every dump while reading the stream in chunks.
+    #  At most one dump plus one chunk is held in memory. Dumps are split as
+    #  in `_dump_offsets`.
+    buf = b''
+    search = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        buf += chunk
+        while True:
+            end = buf.find(_END_MARKER, search)
+            eol = buf.find(b'\n', end) if end >= 0 else -1
+            if eol < 0:
+                ## Continue the search in the next chunk. The marker may be
+                #  split between both.
+                search = max(0, len(buf) - len(_END_MARKER)) if end < 0 else end
+                break
+            yield buf[:eol + 1]
+            buf = buf[eol + 1:]
+            search = 0
+    if buf:
+        yield buf
+
+
+def _glob_to_regex(glob):
+    ## Wildcards (`*`, `?`) never match whitespace so the result can be
+    #  embedded into the stat line regex.
+    return re.escape(glob).replace(r'\*', r'\S*').replace(r'\?', r'\S')
+
+
+def _key_matcher(keys=None, patterns=None):
+    ## Returns a predicate on the stat key or None if everything matches.
+    #  `keys` are exact stat names or globs like 'system.cpu1.*', `patterns`
+    #  are regular expressions matched against the start of the key.
+    if isinstance(keys, str):
+        keys = [keys]
+    if isinstance(patterns, (str, re.Pattern)):
+        patterns = [patterns]
+    regex = ['(?:%s)\\Z' % _glob_to_regex(k) for k in keys or []]
+    regex += ['(?:%s)' % getattr(p, 'pattern', p) for p in patterns or []]
+    if not regex:
+        return None
+    return re.compile('|'.join(regex)).match
+
+
+def _stats_filter(keys=None, patterns=None):
+    ## Returns the regex used to parse the stat lines of a dump and an optional
+    #  predicate on the stat key. Without regex patterns the keys are compiled
+    #  into the line regex itself so non-matching lines are skipped by the
+    #  regex engine.
+    if not keys and not patterns:
+        return _STAT_LINE, None
+    if not patterns:
+        keys = [keys] if isinstance(keys, str) else keys
+        key_re = '|'.join(_glob_to_regex(k) for k in keys)
+        return re.compile(r'^[ \t\r]*(' + key_re + r')[ \t\r]+(' + _STAT_VALUE + ')', re.M), None
+    return _STAT_LINE, _key_matcher(keys, patterns)
+
+
+def _parse_dump(raw, line_re=_STAT_LINE, match=None):
+    pairs = line_re.findall(raw.decode('utf-8', 'replace'))
+    if match is not None:
+        pairs = ((key, value) for key, value in pairs if match(key))
+    return collections.OrderedDict(pairs)
+
+
+def _filter_stats(stats, keys=None, patterns=None):
+    ## Apply the key filter on already parsed dumps.
+    match = _key_matcher(keys, patterns)
+    if match is None or stats is None:
+        return stats
+    return [collections.OrderedDict((k, v) for k, v in dump.items() if match(k))
+            for dump in stats]
+
+
+def _read_stats_pyparsing(result_dir, stats_file_name, keys=None, patterns=None):
+    ## Reference parser. Slow but kept to cross-check the fast path, so the
+    #  value grammar is written independently of `_STAT_VALUE`: an optional
+    #  sign followed by `inf` or by digits, '.', '%' and 'nan' with an
+    #  optional exponent.
+    from pyparsing import (Char, Combine, Literal, Word, Optional, ParseException, printables,
+                           nums, restOfLine)
+    exponent = Char('e') + Optional(Char('+-')) + Word(nums)
+    value = Combine(Optional(Char('+-')) + (Literal('inf') + ~Char(printables) |
+                                            Word('nan.%' + nums) + Optional(exponent)))
+    stat_rule = Word(printables) + value + Optional(restOfLine)
+
+    stats = []
+
+    try:
+        with io.TextIOWrapper(open_result_file(result_dir, stats_file_name)) as stats_file:
+            i = 0
+            for stat_line in stats_file:
+                if len(stats) <= i:
+                    stats.append(collections.OrderedDict())
+
+                try:
+                    stat = stat_rule.parseString(stat_line)
+                    key = stat[0]
+                    value = stat[1]
+
+                    stats[i][key] = value
+                except ParseException as e:
+                    # print(e)
+                    pass
+
+                if 'End Simulation Statistics' in stat_line:
+                    i += 1
+    except Exception as e:
+        print(e)
+        return None
+    else:
+        return StatsStore.from_dumps(_filter_stats(stats, keys, patterns))
+
+
+class StatsFollower:
+    ## Incremental reader for the stats file of a simulation that is still
+    #  running. It remembers the byte offset after the last complete dump and
+    #  `refresh` only parses dumps appended since then. A dump is complete
+    #  once its 'End Simulation Statistics' line is written.
+    def __init__(self, result_dir, stats_file_name="stats.txt", keys=None, patterns=None):
+        self.stats_file = path.join(result_dir, stats_file_name)
+        self.line_re, self.match = _stats_filter(keys, patterns)
+        self.offset = 0
+        self.stats = []
+
+    def refresh(self):
+        ## Returns the list of dumps completed since the last refresh.
+        try:
+            size = stat(self.stats_file).st_size
+        except OSError:
+            return []
+        if size < self.offset:
+            ## The file was truncated, i.e. the simulation was restarted.
+            self.offset = 0
+            self.stats = []
+        if size == self.offset:
+            return []
+
+        with open(self.stats_file, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+
+        end = data.rfind(_END_MARKER)
+        eol = data.find(b'\n', end) if end >= 0 else -1
+        if eol < 0:
+            return []
+        data = data[:eol + 1]
+
+        new = list(StatsStore.from_dumps(_parse_dump(data[start:end], self.line_re, self.match)
+                                         for start, end in _dump_offsets(data)))
+        self.offset += len(data)
+        self.stats += new
+        return new
+
+
+def follow_stats(result_dir, stats_file_name="stats.txt", interval=60, keys=None, patterns=None):
+    ## Generator yielding every dump of a running simulation once it is
+    #  complete. Polls the stats file every `interval` seconds.
+    follower = StatsFollower(result_dir, stats_file_name, keys, patterns)
+    while True:
+        for dump in follower.refresh():
+            yield dump
+        time.sleep(interval)
+
+
+def read_stats(result_dir, stats_file_name, fast=True, keys=None, patterns=None):
+    ## Returns the stats of all dumps as `StatsStore`. The values are converted
+    #  to int or float while parsing and held in compact arrays.
+    #  Set `fast=False` to use the original pyparsing grammar instead.
+    #  `keys` (exact names or globs) and `patterns` (regexes) restrict the
+    #  returned stats to the matching keys. All others are skipped while parsing.
+    if not fast:
+        return _read_stats_pyparsing(result_dir, stats_file_name, keys, patterns)
+
+    line_re, match = _stats_filter(keys, patterns)
+    try:
+        with open_result_file(result_dir, stats_file_name) as stats_file:
+            stats = StatsStore.from_dumps(_parse_dump(raw, line_re, match)
+                                          for raw in _iter_dumps(stats_file))
+    except Exception as e:
+        print(e)
+        return None
+    else:
+        return stats
+
+## Central parse cache
+#  Parsed stats are kept in one cache directory instead of the result
+#  directories so read only result archives can be cached as well. The
+#  location is taken from $GEM5_STATS_CACHE (empty disables the cache) and
+#  the size budget in bytes from $GEM5_STATS_CACHE_SIZE (suffixes K, M, G).
+#  Entries are keyed on a fingerprint of the stats file content and the
+#  parser version. Bump the version whenever the parsing result changes.
+STATS_PARSER_VERSION = 3
+_FINGERPRINT_CHUNK = 1 << 16
+
+
+def stats_cache_dir():
+    return os.environ.get("GEM5_STATS_CACHE", path.join(path.expanduser("~"), ".cache", "gem5_utils"))
+
+
+_DEFAULT_CACHE_SIZE = "4G"
+
+
+def _stats_cache_budget():
+    ## GEM5_STATS_CACHE_SIZE in bytes, e.g. 4G, 4GB, 4GiB or 500M.
+    size = os.environ.get("GEM5_STATS_CACHE_SIZE", _DEFAULT_CACHE_SIZE).strip().upper()
+    if size.endswith("IB"):
+        size = size[:-2]
+    elif size.endswith("B"):
+        size = size[:-1]
+    unit = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}.get(size[-1:], 1)
+    try:
+        return int(float(size.rstrip("KMGT")) * unit)
+    except ValueError:
+        print("Invalid GEM5_STATS_CACHE_SIZE {!r}, using {}".format(
+            os.environ["GEM5_STATS_CACHE_SIZE"], _DEFAULT_CACHE_SIZE))
+        return 4 << 30
+
+
+def _stats_cache_key(stats_file, st):
+    ## Hash of the parser version, the identity of the file (device, inode,
+    #  size and modification time) and its first and last chunk. gem5 writes
+    #  fixed width columns so a rerun produces a file of the same size, the
+    #  modification time tells it apart without reading the whole file.
+    h = hashlib.sha1("{}:{}:{}:{}:{}".format(STATS_PARSER_VERSION, st.st_dev, st.st_ino,
+                                              st.st_size, st.st_mtime_ns).encode())
+    with open(stats_file, 'rb') as f:
+        h.update(f.read(_FINGERPRINT_CHUNK))
+        if st.st_size > _FINGERPRINT_CHUNK:
+            f.seek(max(_FINGERPRINT_CHUNK, st.st_size - _FINGERPRINT_CHUNK))
+            h.update(f.read(_FINGERPRINT_CHUNK))
+    return h.hexdigest()
+
+
+_CACHE_SUFFIXES = (".cols", ".idx")
+
+
+def _stats_cache_file(key, suffix):
+    cache_dir = stats_cache_dir()
+    return path.join(cache_dir, key + suffix) if cache_dir else None
+
+
+def _stats_cache_touch(cache_file):
+    ## Mark the entry as recently used for the LRU eviction.
+    try:
+        os.utime(cache_file)
+    except OSError:
+        pass
+
+
+def _stats_cache_evict():
+    ## Remove the least recently used entries until the cache fits the budget.
+    #  Only parsed stores and dump indices are evicted, other files and
+    #  subdirectories (like the summary catalogs) are left alone.
+    cache_dir = stats_cache_dir()
+    try:
+        entries = []
+        for entry in os.scandir(cache_dir):
+            if entry.name.endswith(_CACHE_SUFFIXES) and entry.is_file():
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    except OSError:
+        return
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    budget = _stats_cache_budget()
+    for _, size, filename in entries:
+        if total <= budget:
+            break
+        try:
+            os.remove(filename)
+            total -= size
+        except OSError:
+            pass
+
+
+def _stats_cache_save(store, cache_file):
+    try:
+        os.makedirs(path.dirname(cache_file), exist_ok=True)
+        store.save(cache_file)
+    except OSError:
+        ## Read only cache directory.
+        return
+    _stats_cache_evict()
+
+
+def index_stats(result_dir, stats_file_name="stats.txt"):
+    ## Returns the (start, end) byte offsets of every dump in the stats file.
+    #  The offsets are found with a single scan over the memory mapped file and
+    #  kept in the central parse cache. For compressed files the offsets refer
+    #  to the decompressed stream.
+    stats_file = find_result_file(result_dir, stats_file_name)
+    if stats_file is None:
+        raise FileNotFoundError("No such file: '{}'".format(path.join(result_dir, stats_file_name)))
+    st = stat(stats_file)
+    index_file = _stats_cache_file(_stats_cache_key(stats_file, st), ".idx")
+
+    try:
+        with open(index_file) as f:
+            index = json.load(f)
+        if index["size"] == st.st_size:
+            _stats_cache_touch(index_file)
+            return [tuple(o) for o in index["offsets"]]
+    except (OSError, TypeError, ValueError, KeyError):
+        pass
+
+    offsets = []
+    if _is_compressed(stats_file):
+        start = 0
+        with open_result_file(result_dir, stats_file_name) as stream:
+            for raw in _iter_dumps(stream):
+                offsets.append((start, start + len(raw)))
+                start += len(raw)
+    elif st.st_size > 0:
+        with open(stats_file, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offsets = _dump_offsets(data)
+
+    if index_file:
+        try:
+            os.makedirs(path.dirname(index_file), exist_ok=True)
+            with open(index_file, 'w') as f:
+                json.dump({"size": st.st_size, "offsets": offsets}, f)
+        except OSError:
+            ## Read only cache directory. Just don't cache the index.
+            pass
+    return offsets
+
+
+def _nth_dump(stream, dump):
+    ## Stream to the requested dump. Compressed files can not seek.
+    if dump >= 0:
+        for i, raw in enumerate(_iter_dumps(stream)):
+            if i == dump:
+                return raw
+        raise IndexError("dump index out of range")
+    last = collections.deque(_iter_dumps(stream), maxlen=-dump)
+    if len(last) < -dump:
+        raise IndexError("dump index out of range")
+    return last[0]
+
+
+def read_stats_dump(result_dir, stats_file_name, dump, keys=None, patterns=None):
+    ## Parse only the dump with the given number (negative numbers count from
+    #  the end) by seeking to its offset from the dump index.
+    line_re, match = _stats_filter(keys, patterns)
+    try:
+        stats_file = find_result_file(result_dir, stats_file_name)
+        if stats_file is not None and _is_compressed(stats_file):
+            with open_result_file(result_dir, stats_file_name) as stream:
+                data = _nth_dump(stream, dump)
+        else:
+            start, end = index_stats(result_dir, stats_file_name)[dump]
+            with open(path.join(result_dir, stats_file_name), 'rb') as stats_file:
+                stats_file.seek(start)
+                data = stats_file.read(end - start)
+    except Exception as e:
+        print(e)
+        return None
+    else:
+        return StatsStore.from_dumps([_parse_dump(data, line_re, match)])[0]
+
+
+## HDF5 stats
+#  gem5 writes the stats as HDF5 file with `--stats-file=h5://stats.h5` or
+#  `--stats-format hdf5` of the run scripts. Each stat is a dataset under
+#  the group path of its SimObject with one row per dump. Vector stats have
+#  an additional column per sub name (attribute 'subnames'). Needs `h5py`.
+def _hdf5_stats_file(result_dir, stats_file_name):
+    ## Returns the name of the HDF5 stats file to use instead of the text
+    #  stats or None.
+    if stats_file_name.endswith(".h5"):
+        return stats_file_name
+    if find_result_file(result_dir, stats_file_name) is None:
+        h5_file_name = path.splitext(stats_file_name)[0] + ".h5"
+        if path.isfile(path.join(result_dir, h5_file_name)):
+            return h5_file_name
+    return None
+
+
+def read_stats_hdf5(result_dir, stats_file_name="stats.h5", dump=None, keys=None, patterns=None):
+    ## Returns the stats as `StatsStore`. Only the datasets of matching stats
+    #  and only the requested dump (negative numbers count from the end) are
+    #  read from the file.
+    import h5py
+
+    match = _key_matcher(keys, patterns)
+    names = []
+    columns = []
+    try:
+        with h5py.File(path.join(result_dir, stats_file_name), 'r') as f:
+            datasets = []
+
+            def visit(name, obj):
+                if isinstance(obj, h5py.Dataset):
+                    datasets.append((name, obj))
+            f.visititems(visit)
+
+            n_dumps = datasets[0][1].shape[0] if datasets else 0
+            if dump is None:
+                rows = slice(None)
+            else:
+                if not -n_dumps <= dump < n_dumps:
+                    raise IndexError("dump index out of range")
+                rows = slice(dump % n_dumps, dump % n_dumps + 1)
+
+            for name, dataset in datasets:
+                key = name.replace('/', '.')
+                if dataset.ndim > 1:
+                    subnames = [sub.decode() if isinstance(sub, bytes) else str(sub)
+                                for sub in dataset.attrs.get('subnames', [])]
+                    width = int(np.prod(dataset.shape[1:]))
+                    if len(subnames) != width:
+                        subnames = [str(i) for i in range(width)]
+                    stat_keys = ["{}::{}".format(key, sub) for sub in subnames]
+                else:
+                    stat_keys = [key]
+                selected = [i for i, k in enumerate(stat_keys) if match is None or match(k)]
+                if not selected:
+                    continue
+                values = np.asarray(dataset[rows], dtype=np.float64)
+                columns.append(values.reshape(values.shape[0], -1)[:, selected])
+                names += [stat_keys[i] for i in selected]
+    except Exception as e:
+        print(e)
+        return None
+
+    n_rows = len(range(n_dumps)[rows])
+    floats = np.hstack(columns) if columns else np.empty((n_rows, 0))
+    ## HDF5 stores all values as double. Columns holding only whole numbers
+    #  become ints as in the text stats.
+    with np.errstate(invalid='ignore'):
+        is_int = np.all(np.isfinite(floats) & (floats == np.round(floats)) & (np.abs(floats) < 2 ** 53), axis=0)
+    return StatsStore(names, is_int, floats[:, is_int].astype(np.int64), floats[:, ~is_int],
+                      np.ones(floats.shape, dtype=bool))
+
+
+def _load_store(store_file, source):
+    ## Returns the stats store if it exists and was built from the current
+    #  version of the stats file.
+    if not store_file:
+        return None
+    try:
+        store = StatsStore.load(store_file)
+    except (OSError, ValueError):
+        return None
+    if store.source != source:
+        return None
+    _stats_cache_touch(store_file)
+    return store
+
+
+def find_stats(result_dir, stats_file_name="stats.txt", dump=None, keys=None, patterns=None):
+    ## Returns the typed stats of all dumps as `StatsStore` or only the
+    #  requested dump.
+    #  In case this is the first time we read values from this file or if the
+    #  stats file has changed in the meantime the file is parsed and stored in
+    #  columnar form in the central parse cache. Later calls memory map this
+    #  store instead of parsing again.
+    #  If there is only a HDF5 stats file (or `stats_file_name` ends with
+    #  '.h5') the requested stats are read directly from it.
+    h5_file_name = _hdf5_stats_file(result_dir, stats_file_name)
+    if h5_file_name is not None:
+        store = read_stats_hdf5(result_dir, h5_file_name, dump, keys, patterns)
+        return store if store is None or dump is None else store[0]
+
+    stats_file = find_result_file(result_dir, stats_file_name) or path.join(result_dir, stats_file_name)
+    try:
+        source = _stats_cache_key(stats_file, stat(stats_file))
+    except OSError as e:
+        print(e)
+        return None
+    store_file = _stats_cache_file(source, ".cols")
+
+    store = _load_store(store_file, source)
+    if store is None:
+        if dump is not None:
+            ## Read only the requested dump directly from the stats file
+            #  with the help of the dump index.
+            return read_stats_dump(result_dir, stats_file_name, dump, keys, patterns)
+
+        ## Only a subset of the stats is requested. Parse just those
+        #  instead of filling the store with all of them.
+        store = read_stats(result_dir, stats_file_name, keys=keys, patterns=patterns)
+        if store is None:
+            return None
+        store.source = source
+        if keys or patterns:
+            return store
+        if store_file:
+            _stats_cache_save(store, store_file)
+
+    store = store.select(keys, patterns)
+    if dump is None:
+        return store
+    try:
+        return store[dump]
+    except IndexError as e:
+        print(e)
+        return None
+
+
+def _find_stats_worker(result_dir, keys, patterns):
+    ## Runs in the process pool. Stores mapped from the parse cache are
+    #  passed back by file name only.
+    stats = find_stats(result_dir, keys=keys, patterns=patterns)
+    if isinstance(stats, StatsStore) and stats.filename:
+        return stats.filename
+    return stats
+
+
+def find_stats_group(result_dir, keys=None, patterns=None, workers=1):
+    ## With this function we want to get the values from an entire folder full of results
+    #  With `workers` > 1 the subdirectories are parsed in a process pool.
+    #  The result keeps the sorted order of the subdirectories. Directories
+    #  that fail are reported and skipped.
+    subdirs = [s for s in listdir(result_dir) if path.isdir(path.join(result_dir, s))]
+    subdirs.sort()
+    stats_group = {}
+
+    if workers > 1 and len(subdirs) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_find_stats_worker, path.join(result_dir, subdir), keys, patterns)
+                       for subdir in subdirs]
+            results = []
+            for subdir, future in zip(subdirs, futures):
+                try:
+                    stats = future.result()
+                    if isinstance(stats, str):
+                        try:
+                            stats = StatsStore.load(stats)
+                        except OSError:
+                            ## Evicted from the cache in the meantime.
+                            stats = find_stats(path.join(result_dir, subdir), keys=keys, patterns=patterns)
+                    results.append(stats)
+                except Exception as e:
+                    print("{}: {}".format(subdir, e))
+                    results.append(None)
+    else:
+        results = []
+        for subdir in subdirs:
+            try:
+                results.append(find_stats(path.join(result_dir, subdir), keys=keys, patterns=patterns))
+            except Exception as e:
+                print("{}: {}".format(subdir, e))
+                results.append(None)
+
+    for subdir, stats in zip(subdirs, results):
+        if stats:
+            stats_group[subdir] = stats
+
+    return stats_group
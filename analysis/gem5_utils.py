@@ -3,15 +3,26 @@
 import csv
 import json
 
-import collections
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import io
+import os
+import pickle
+import re
+import shutil
+import sys
+import tempfile
+import numpy as np
 from numpy import dtype
-from objectpath import *
 from os import path, listdir, stat
-from pyparsing import Word, Optional, ParseException, printables, nums, restOfLine
-import matplotlib.pyplot as plt
-import pandas as pd
-import pickle
-import seaborn as sns
+
+## The parsing core lives in gem5_stats. pandas and the plotting libraries
+#  take most of the import time and are only imported by the functions
+#  that need them.
+from gem5_stats import *
+from gem5_stats import _glob_to_regex, _stats_frame
 
 
 class ExperimentResults:
@@ -22,11 +33,66 @@ class ExperimentResults:
 
 
 class ExperimentConfigs:
-    def __init__(self, raw_configs):
-        self.raw_configs = raw_configs
+    ## Lookups of dotted paths like 'system.cpu1.dcache.size' in gem5's
+    #  config.json. The json tree is flattened once into a path -> value index
+    #  so each lookup is a dict hit. Lists of SimObjects are indexed by the
+    #  object name (system.cpu0, system.cpu1, ...). Paths with wildcards
+    #  (`*`, `?`) return a dict of all matching paths. With a `config_file`
+    #  the json tree is only read from it on first use.
+    def __init__(self, raw_configs, config_file=None):
+        self._raw_configs = raw_configs
+        self.config_file = config_file
+        self._index = None
+        self._wildcards = {}
+
+    @property
+    def raw_configs(self):
+        if self._raw_configs is None and self.config_file is not None:
+            with open(self.config_file) as f:
+                self._raw_configs = json.load(f)
+        return self._raw_configs
+
+    def __getstate__(self):
+        ## The index is rebuilt on demand, only send the json tree or the
+        #  file it is read from.
+        raw_configs = None if self.config_file is not None else self._raw_configs
+        return {"_raw_configs": raw_configs, "config_file": self.config_file,
+                "_index": None, "_wildcards": {}}
+
+    def __setstate__(self, state):
+        ## Pickles of older versions hold the tree under `raw_configs`.
+        if "raw_configs" in state:
+            state = dict(state, _raw_configs=state.pop("raw_configs"), config_file=None)
+        self.__dict__.update(state)
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = {}
+            if self.raw_configs is not None:
+                self._flatten(self.raw_configs, "")
+        return self._index
+
+    def _flatten(self, node, prefix):
+        if prefix:
+            self._index[prefix] = node
+        if isinstance(node, dict):
+            for key, value in node.items():
+                self._flatten(value, prefix + "." + key if prefix else key)
+        elif isinstance(node, list) and node and all(isinstance(v, dict) for v in node):
+            parent = prefix.rpartition(".")[0]
+            for i, value in enumerate(node):
+                name = value.get("name")
+                self._flatten(value, (parent + "." + name if parent else name) if name else
+                              "{}.{}".format(prefix, i))
 
     def __getitem__(self, index):
-        return self.raw_configs.execute('$.' + index)
+        if "*" in index or "?" in index:
+            if index not in self._wildcards:
+                match = re.compile(_glob_to_regex(index) + r"\Z").match
+                self._wildcards[index] = {k: v for k, v in self.index.items() if match(k)}
+            return self._wildcards[index]
+        return self.index.get(index)
 
 
 class ExperimentStats:
@@ -34,12 +100,50 @@ class ExperimentStats:
         self.raw_stats = raw_stats
 
     def __getitem__(self, index):
-        return self.raw_stats[index] if index in self.raw_stats else None
+        ## Distributions, histograms and vectors are returned as a whole
+        #  when indexed by their name without '::<sub name>'.
+        value = self.raw_stats.get(index)
+        if value is None and hasattr(self.raw_stats, "group"):
+            value = self.raw_stats.group(index)
+        return value
+
+    def select(self, regex):
+        ## DataFrame of all stats fully matching `regex` indexed by (dump,
+        #  captured groups), e.g. select(r'system\.cpu(\d+)\.(icache|dcache)\.overallMisses::total').
+        if isinstance(self.raw_stats, StatsDump):
+            return self.raw_stats.store.frame(regex, [self.raw_stats.dump])
+        r = re.compile(regex)
+        rows = [(0,) + (m.groups() or (key,)) + (value,) for key, value in self.raw_stats.items()
+                for m in (r.fullmatch(key),) if m]
+        return _stats_frame(r, [row[:-1] for row in rows], [row[-1] for row in rows])
+
+def select_stats(results, regex, dumps=None, run=None):
+    ## `ExperimentStats.select` over a list of results and dumps (default
+    #  all). The index gets an outer "run" level labeled by `run(result)`,
+    #  by default the position in `results`.
+    import pandas as pd
+    frames, labels = [], []
+    for i, result in enumerate(results):
+        if not result.stats:
+            continue
+        raw = result.stats[0].raw_stats
+        if isinstance(raw, StatsDump):
+            frame = raw.store.frame(regex, dumps)
+        else:
+            selected = range(len(result.stats)) if dumps is None else dumps
+            frame = pd.concat([result.stats[d].select(regex).rename(index={0: d}, level="dump")
+                               for d in selected])
+        frames.append(frame)
+        labels.append(run(result) if run else i)
+    if not frames:
+        return ExperimentStats({}).select(regex)
+    return pd.concat(frames, keys=labels, names=["run"])
 
 
 def read_configs(result_dir, config_json_file_name):
+    ## The config.json might be compressed (config.json.gz/.xz/.zst).
     try:
-        with open(path.join(result_dir, config_json_file_name)) as config_json_file:
+        with io.TextIOWrapper(open_result_file(result_dir, config_json_file_name)) as config_json_file:
             # configs = Tree(json.load(config_json_file))
             configs = json.load(config_json_file)
     except Exception as e:
@@ -49,99 +153,490 @@ def read_configs(result_dir, config_json_file_name):
         return configs
 
 
-def read_stats(result_dir, stats_file_name):
-    stat_rule = Word(printables) + Word('nan.%' + nums) + Optional(restOfLine)
+def parse_result(result_dir, config_json_file_name='config.json', stats_file_name='stats.txt',
+                 keys=None, patterns=None, **props):
+    stats = find_stats(result_dir, stats_file_name, keys=keys, patterns=patterns) or []
+    return ExperimentResults(ExperimentConfigs(read_configs(result_dir, config_json_file_name)),
+                             [ExperimentStats(stat) for stat in stats], props)
+
+
+## Sharing results between processes
+#  `share_results` publishes a loaded list of results once: every stats store
+#  is written to a directory in /dev/shm (or $GEM5_SHARE_DIR) and the rest of
+#  the results go to a small pickle which refers to the stores by file name.
+#  `attach_results(handle)` in a worker process memory maps the stores, so
+#  all workers read the same pages instead of each holding its own copy.
+#  The configs are written as json files next to the stores and a worker
+#  only reads the configs of the results it looks at.
+#  The copies in /dev/shm also can not be evicted from the parse cache while
+#  the workers run. Call `release_results(handle)` when done.
+_attached_results = {}
+
+
+def _share_dir():
+    share_dir = os.environ.get("GEM5_SHARE_DIR")
+    if share_dir is None:
+        share_dir = "/dev/shm" if path.isdir("/dev/shm") else tempfile.gettempdir()
+    return share_dir
+
+
+def share_results(results):
+    handle = tempfile.mkdtemp(prefix="gem5_results_", dir=_share_dir())
+    shared = {}
+
+    def share(stats):
+        raw = stats.raw_stats
+        if not isinstance(raw, StatsDump):
+            return stats
+        store = raw.store
+        if id(store) not in shared:
+            filename = path.join(handle, "{}.cols".format(len(shared)))
+            try:
+                shutil.copyfile(store.filename, filename)
+            except (TypeError, OSError):
+                ## In memory or evicted from the parse cache (the mapped
+                #  arrays stay valid). Save a copy, `save` would point the
+                #  caller's store to /dev/shm.
+                StatsStore(store.keys, store.is_int, store.ints, store.floats,
+                           store.present, store.source).save(filename)
+            shared[id(store)] = StatsStore.load(filename)
+        return ExperimentStats(StatsDump(shared[id(store)], raw.dump))
+
+    configs = {}
+
+    def share_configs(config):
+        if not isinstance(config, ExperimentConfigs) or config.raw_configs is None:
+            return config
+        if id(config) not in configs:
+            filename = path.join(handle, "{}.json".format(len(configs)))
+            with open(filename, 'w') as f:
+                json.dump(config.raw_configs, f)
+            configs[id(config)] = ExperimentConfigs(None, filename)
+        return configs[id(config)]
+
+    published = [ExperimentResults(share_configs(r.configs), [share(s) for s in r.stats], r.props)
+                 for r in results]
+    with open(path.join(handle, "results.pkl"), 'wb') as f:
+        pickle.dump(published, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return handle
+
+
+def attach_results(handle):
+    ## Loaded once per process.
+    if handle not in _attached_results:
+        with open(path.join(handle, "results.pkl"), 'rb') as f:
+            _attached_results[handle] = pickle.load(f)
+    return _attached_results[handle]
+
+
+def release_results(handle):
+    _attached_results.pop(handle, None)
+    shutil.rmtree(handle, ignore_errors=True)
+
+
+## Vectorized field extraction
+#  Instead of a lambda a field can be given as stat name or as expression
+#  over stat names, e.g. 'system.cpu1.numCycles / system.cpu1.numInsts'.
+#  Each stat is gathered once into a numpy array over all results and the
+#  expression is evaluated on whole columns. Sub names may be dotted like
+#  the per requestor stats ('...overallMisses::cpu1.data'). Stat names
+#  containing '-' need to be separated from a following subtraction by
+#  whitespace.
+_EXPR_NAME = re.compile(r'(?<![\w.])([A-Za-z_]\w*(?:\.\w+)*(?:::\w+(?:\.\w+)*(?:-\d+)?)?)(\s*\()?')
+_EXPR_FUNCTIONS = {
+    "abs": np.abs, "exp": np.exp, "log": np.log, "log2": np.log2, "log10": np.log10,
+    "sqrt": np.sqrt, "min": np.minimum, "max": np.maximum, "where": np.where,
+    ## First value that is not nan, e.g. for stats named differently per CPU model.
+    "coalesce": lambda first, *others: functools.reduce(
+        lambda a, b: np.where(np.isnan(a), b, a), others, np.asarray(first, dtype=np.float64)),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_expression(expr):
+    ## Returns the compiled expression and the stat names it references in the
+    #  order of the variables `_s0`, `_s1`, ...
+    names = []
+
+    def replace(m):
+        name, call = m.group(1), m.group(2)
+        if call and name in _EXPR_FUNCTIONS:
+            return m.group(0)
+        if name not in names:
+            names.append(name)
+        return "_s{}{}".format(names.index(name), call or "")
+
+    return compile(_EXPR_NAME.sub(replace, expr), expr, 'eval'), tuple(names)
+
+
+def _to_array(values):
+    ## int64 if all values are ints, float64 with nan for missing values otherwise.
+    if all(type(v) is int for v in values):
+        return np.array(values, dtype=np.int64)
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def stat_column(results, key, dump=0):
+    ## Returns one stat of the given dump over all results as numpy array.
+    #  Stats of a `StatsStore` are read from its matrices directly.
+    values, ints = [], True
+    for result in results:
+        try:
+            stats = result.stats[dump]
+        except IndexError:
+            values.append(None)
+            ints = False
+            continue
+        raw = stats.raw_stats
+        if type(raw) is StatsDump:
+            store = raw.store
+            entry = store.index.get(key)
+            if entry is not None:
+                if store.present.item(raw.dump, entry[0]):
+                    values.append(entry[1].item(raw.dump, entry[2]))
+                    ints = ints and entry[1] is store.ints
+                else:
+                    values.append(None)
+                    ints = False
+                continue
+        value = stats[key]
+        values.append(value)
+        ints = ints and type(value) is int
+    if ints:
+        return np.array(values, dtype=np.int64)
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def distribution_column(results, name, dump=0):
+    ## Returns one distribution of the given dump over all results stacked
+    #  into a single `Distribution` with one row per result.
+    return Distribution.stack([result.stats[dump][name] for result in results])
+
+
+def _eval_expression(expr, column):
+    ## `column(name)` returns the array of values of one stat.
+    code, names = _compile_expression(expr)
+    env = {"_s{}".format(i): column(name) for i, name in enumerate(names)}
+    env.update(_EXPR_FUNCTIONS)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.asarray(eval(code, {"__builtins__": {}}, env))
+
+
+## Derived metrics
+#  `metric(name, expr)` registers a named expression. Metric names can be
+#  used wherever a stat name or expression is accepted, also inside other
+#  metrics. Registering a name again replaces the formula.
+_METRICS = {}
+
+
+def metric(name, expr):
+    _METRICS[name] = expr
+    return name
+
+
+metric('cycles', 'system.cpu1.numCycles')
+metric('insts', 'coalesce(system.cpu1.numInsts, system.cpu1.exec_context.thread_0.numInsts)')
+metric('cpi', 'cycles / insts')
+metric('ipc', 'insts / cycles')
+metric('mpki_l1i', '1000 * system.cpu1.icache.overallMisses::total / insts')
+metric('mpki_l1d', '1000 * system.cpu1.dcache.overallMisses::total / insts')
+metric('mpki_l2', '1000 * system.cpu1.l2cache.overallMisses::total / insts')
+metric('mpki_l3', '1000 * system.l3cache.overallMisses::total / insts')
+metric('miss_rate_l1i', 'system.cpu1.icache.overallMissRate::total')
+metric('miss_rate_l1d', 'system.cpu1.dcache.overallMissRate::total')
+metric('miss_rate_l2', 'system.cpu1.l2cache.overallMissRate::total')
+metric('miss_rate_l3', 'system.l3cache.overallMissRate::total')
+
+
+def expression_stats(expr):
+    ## The stat names an expression references, with metrics resolved.
+    names = []
+    for name in _compile_expression(_METRICS.get(expr, expr))[1]:
+        for stat_name in expression_stats(name) if name in _METRICS else (name,):
+            if stat_name not in names:
+                names.append(stat_name)
+    return names
+
+
+def expand_metrics(expr):
+    ## The formula with all metric names replaced by their formulas.
+    def replace(m):
+        if m.group(1) in _METRICS and not m.group(2):
+            return "({})".format(expand_metrics(_METRICS[m.group(1)]))
+        return m.group(0)
+    return _EXPR_NAME.sub(replace, _METRICS.get(expr, expr))
+
+
+def _eval_metric(expr, column, cache):
+    ## Like `_eval_expression` but resolves metric names. The value of each
+    #  (sub)expression is memoized in `cache` under its expanded formula, so
+    #  a changed metric never hits a stale value.
+    key = expand_metrics(expr)
+    if key not in cache:
+        cache[key] = _eval_expression(
+            _METRICS.get(expr, expr),
+            lambda name: _eval_metric(name, column, cache) if name in _METRICS else column(name))
+    return cache[key]
+
+
+def evaluate(results, expr, dump=0):
+    ## Evaluate a stat name, metric or expression for all results.
+    return _eval_metric(expr, lambda name: stat_column(results, name, dump), {})
+
+
+class ResultSet:
+    ## Evaluates metrics over a fixed list of results and memoizes the stat
+    #  columns as well as the value of every formula. Changing a metric only
+    #  recomputes the formulas that use it, `extend` only loads the stats
+    #  of the new results.
+    def __init__(self, results, dump=0):
+        self.results = list(results)
+        self.dump = dump
+        self._columns = {}
+        self._values = {}
+
+    def __len__(self):
+        return len(self.results)
+
+    def _column(self, name):
+        if name not in self._columns:
+            self._columns[name] = stat_column(self.results, name, self.dump)
+        return self._columns[name]
+
+    def evaluate(self, expr):
+        value = _eval_metric(expr, self._column, self._values)
+        return np.broadcast_to(value, (len(self.results),)) if value.ndim == 0 else value
+
+    def __getitem__(self, expr):
+        return self.evaluate(expr)
+
+    def extend(self, results):
+        results = list(results)
+        for name, column in self._columns.items():
+            self._columns[name] = np.concatenate([column, stat_column(results, name, self.dump)])
+        self.results += results
+        self._values.clear()
+
+    def to_pandas(self, metrics):
+        ## One column per metric, stat name or expression.
+        import pandas as pd
+        return pd.DataFrame({m: self.evaluate(m) for m in metrics})
+
+
+## Per invocation stats
+#  With `--dump-stats invocation` the run scripts reset the stats at the
+#  begin and dump them at the end of every measured invocation, so dump i
+#  of a stats file holds invocation i. gem5 appends one more dump when it
+#  exits which is not an invocation.
+def _dump_column(result):
+    ## name -> values of the stat in all dumps of one result.
+    raw = result.stats[0].raw_stats
+    if isinstance(raw, StatsDump):
+        return lambda name: raw.store.columns([name])[:, 0]
+    return lambda name: _to_array([stats.raw_stats.get(name) for stats in result.stats])
+
+
+def _modified_z_score(values):
+    ## |value - median| in units of the median absolute deviation. If more
+    #  than half of the values are equal the MAD is 0, then the mean absolute
+    #  deviation is used instead (Iglewicz and Hoaglin). nan if all values
+    #  are equal.
+    if not len(values) or np.isnan(values).all():
+        return np.full(len(values), np.nan)
+    deviation = np.abs(values - np.nanmedian(values))
+    mad = np.nanmedian(deviation)
+    if mad > 0:
+        return 0.6745 * deviation / mad
+    return deviation / (1.253314 * np.nanmean(deviation))
+
+
+def invocation_stats(results, metrics=("cycles", "insts", "cpi"), run=None, threshold=3.5,
+                     invocations=None):
+    ## One row per (run, invocation) with a column per metric, stat name or
+    #  expression. `<metric>_outlier` flags invocations whose modified
+    #  z-score (distance to the median in units of the median absolute
+    #  deviation, see `_modified_z_score`) within their run is above
+    #  `threshold`. Runs are labeled
+    #  by `run(result)`, by default their position in `results`.
+    #  `invocations` is the number of measured invocations of each run (or a
+    #  function of the result returning it), only that many leading dumps are
+    #  used. By default all dumps but the last one, the exit dump of gem5.
+    import pandas as pd
+    rows = []
+    for i, result in enumerate(results):
+        if not result.stats:
+            continue
+        n = len(result.stats)
+        if invocations is None:
+            count = n - 1 if n > 1 else n
+        else:
+            count = min(n, invocations(result) if callable(invocations) else invocations)
+        column, cache = _dump_column(result), {}
+        df = pd.DataFrame({"run": run(result) if run else i, "invocation": np.arange(count)})
+        for m in metrics:
+            values = np.broadcast_to(_eval_metric(m, column, cache), (n,))[:count].astype(np.float64)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                df[m] = values
+                df[m + "_outlier"] = _modified_z_score(values) > threshold
+        rows.append(df)
+    if not rows:
+        return pd.DataFrame(columns=["run", "invocation"] + [c for m in metrics for c in (m, m + "_outlier")])
+    return pd.concat(rows, ignore_index=True)
+
+
+def invocation_summary(df, metrics=("cycles", "insts", "cpi")):
+    ## Mean, variance, coefficient of variation and number of outliers per
+    #  run and metric of an `invocation_stats` DataFrame.
+    import pandas as pd
+    summary = {}
+    for m in metrics:
+        g = df.groupby("run")
+        summary[(m, "mean")] = g[m].mean()
+        summary[(m, "var")] = g[m].var()
+        summary[(m, "cv")] = g[m].std() / summary[(m, "mean")]
+        summary[(m, "outliers")] = g[m + "_outlier"].sum()
+    return pd.DataFrame(summary)
+
+
+def _field_column(result_set, field):
+    ## Lambdas are the slow path and are called for each result. Stat
+    #  columns and formulas shared by several fields (like `insts` in `cpi`
+    #  and the mpki metrics) are gathered once by the `ResultSet`.
+    if callable(field[1]):
+        return [field[1](result) for result in result_set.results]
+    return result_set.evaluate(field[1])
+
+
+def _ini_value(value):
+    if value in ("true", "false"):
+        return value == "true"
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
 
-    stats = []
 
-    try:
-        with open(path.join(result_dir, stats_file_name)) as stats_file:
-            i = 0
-            for stat_line in stats_file:
-                if len(stats) <= i:
-                    stats.append(collections.OrderedDict())
+_config_ini_cache = {}
 
-                try:
-                    stat = stat_rule.parseString(stat_line)
-                    key = stat[0]
-                    value = stat[1]
 
-                    stats[i][key] = value
-                except ParseException as e:
-                    # print(e)
-                    pass
+def clear_config_ini_cache():
+    ## Forget the parsed config.ini files, e.g. to time `read_config_ini`.
+    _config_ini_cache.clear()
 
-                if 'End Simulation Statistics' in stat_line:
-                    i += 1
-    except Exception as e:
-        print(e)
+
+def read_config_ini(result_dir, config_ini_file_name='config.ini'):
+    ## Returns the parameters of gem5's config.ini as dict of dotted path
+    #  ('system.cpu1.dcache.size') -> value. Numbers and booleans are
+    #  converted, everything else stays a string. The parsed file is cached
+    #  in the process as long as it does not change.
+    filename = find_result_file(result_dir, config_ini_file_name)
+    if filename is None:
+        print("No such file: '{}'".format(path.join(result_dir, config_ini_file_name)))
         return None
+    st = stat(filename)
+    cache_key = (filename, st.st_size, st.st_mtime_ns)
+    if cache_key in _config_ini_cache:
+        return _config_ini_cache[cache_key]
+
+    params = {}
+    section = ""
+    with io.TextIOWrapper(open_result_file(result_dir, config_ini_file_name), errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line[0] in "#;":
+                continue
+            if line[0] == "[" and line[-1] == "]":
+                section = line[1:-1]
+                continue
+            key, sep, value = line.partition("=")
+            if sep:
+                params[section + "." + key] = _ini_value(value)
+    _config_ini_cache[cache_key] = params
+    return params
+
+
+def _results_table_row(result_dir, params, stat_names, dump):
+    ## One row of `results_table`. Runs in the process pool.
+    row = {}
+    config = read_config_ini(result_dir) or {}
+    for param in params:
+        if "*" in param or "?" in param:
+            match = re.compile(_glob_to_regex(param) + r"\Z").match
+            row.update({k: v for k, v in config.items() if match(k)})
+        else:
+            row[param] = config.get(param)
+    stats = find_stats(result_dir, dump=dump, keys=list(stat_names)) if stat_names else {}
+    return row, {name: stats.get(name) for name in stat_names} if stats is not None else {}
+
+
+def results_table(result_dir, params, stats, dump=0, workers=1):
+    ## One wide DataFrame with a row per run (subdirectory) of the results
+    #  tree holding the config.ini parameters `params` (dotted paths or globs)
+    #  and the stats `stats` of the given dump. Stats are given as stat names,
+    #  expressions or (<Name>, <expression>) tuples. With `workers` > 1 the
+    #  runs are loaded in a process pool.
+    import pandas as pd
+    stats = [(s, s) if isinstance(s, str) else tuple(s) for s in stats]
+    stat_names = sorted({name for _, expr in stats for name in expression_stats(expr)})
+    subdirs = sorted(s for s in listdir(result_dir) if path.isdir(path.join(result_dir, s)))
+
+    args = [(path.join(result_dir, subdir), params, stat_names, dump) for subdir in subdirs]
+    rows = []
+    if workers > 1 and len(subdirs) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_results_table_row, *a) for a in args]
+            for subdir, future in zip(subdirs, futures):
+                try:
+                    rows.append((subdir,) + future.result())
+                except Exception as e:
+                    print("{}: {}".format(subdir, e))
     else:
-        return stats
-
-def find_stats(result_dir, stats_file_name="stats.txt"):
-    ## In case this is the first time we read values from this directory
-    #  Or if the stats file has changed in the meantime parse the file to be more faster
-    filename = result_dir + "/" + stats_file_name[:-5]
-    if not path.exists(filename) or path.getmtime(result_dir + "/" + stats_file_name) > path.getmtime(filename):
-        tmp = read_stats(result_dir, stats_file_name)
-        with open(filename, 'wb') as f:
-            pickle.dump(tmp,f)
-
-    with open(filename, 'rb') as f:
-        stats = pickle.load(f)
-        return stats
-    return None
-
-
-def find_stats_group(result_dir):
-    ## With this function we want to get the values from an entire folder full of results
-    subdirs = [s for s in listdir(result_dir) if path.isdir(result_dir + s)]
-    subdirs.sort()
-    stats_group = {}
-
-    for subdir in subdirs:
-        stats = find_stats(path.join(result_dir,subdir))
-        if stats:
-            stats_group[subdir] = stats
-
-    return stats_group
-
-
-
-def parse_result(result_dir, config_json_file_name='config.json', stats_file_name='stats.txt', **props):
-    return ExperimentResults(ExperimentConfigs(read_configs(result_dir, config_json_file_name)),
-                             [ExperimentStats(stat) for stat in read_stats(result_dir, stats_file_name)], props)
-
-
-def to_csv(output_file_name, results, fields):
+        for subdir, a in zip(subdirs, args):
+            try:
+                rows.append((subdir,) + _results_table_row(*a))
+            except Exception as e:
+                print("{}: {}".format(subdir, e))
+
+    df = pd.DataFrame([config for _, config, _ in rows], index=[subdir for subdir, _, _ in rows])
+    raw = {name: _to_array([values.get(name) for _, _, values in rows]) for name in stat_names}
+    values = {}
+    for column, expr in stats:
+        df[column] = _eval_metric(expr, raw.__getitem__, values)
+    df.index.name = "run"
+    return df.reset_index()
+
+
+def to_csv(output_file_name, results, fields, dump=0):
+    result_set = ResultSet(results, dump)
+    columns = [_field_column(result_set, field) for field in fields]
     with open(output_file_name, 'w') as output_file:
         writer = csv.writer(output_file, delimiter=',', quotechar='"', quoting=csv.QUOTE_ALL)
 
         writer.writerow([field[0] for field in fields])
 
-        for result in results:
-            writer.writerow([field[1](result) for field in fields])
+        for row in zip(*columns):
+            writer.writerow(row)
 
-def to_pandas(results, fields):
-    columns = [field[0] for field in fields]
-    dtype = {s:t for s,t in zip([field[0] for field in fields],[field[2] for field in fields])}
-    data = []
-    for result in results:
-        try:
-            data += [[int(field[1](result)) for field in fields]]
-        except:
-            data += [[field[1](result) for field in fields]]
-    return pd.DataFrame(data=data, columns=columns).astype(dtype)
+def to_pandas(results, fields, dump=0):
+    ## Fields are tuples of (<Name>, <stat name, expression or lambda>, <dtype>).
+    #  The dtype is optional for stat names and expressions. Those are taken
+    #  from dump number `dump` and evaluated for all results at once.
+    import pandas as pd
+    result_set = ResultSet(results, dump)
+    columns = {field[0]: _field_column(result_set, field) for field in fields}
+    dtype = {field[0]: field[2] for field in fields if len(field) > 2}
+    return pd.DataFrame(columns).astype(dtype)
 
 
-def generate_plot(csv_file_name, plot_file_name, x, y, hue, y_title, xticklabels_rotation=90):
+def _render_plot(df, plot_file_name, x, y, hue, y_title, xticklabels_rotation=90):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     sns.set(font_scale=1.5)
 
     sns.set_style("white", {"legend.frameon": True})
 
-    df = pd.read_csv(csv_file_name)
-
     ax = sns.barplot(data=df, x=x, y=y, hue=hue, palette=sns.color_palette("Paired"))
     ax.set_xlabel('')
     ax.set_ylabel(y_title)
@@ -165,3 +660,165 @@ def generate_plot(csv_file_name, plot_file_name, x, y, hue, y_title, xticklabels
 
     plt.clf()
     plt.close('all')
+
+
+def generate_plot(csv_file_name, plot_file_name, x, y, hue, y_title, xticklabels_rotation=90):
+    import pandas as pd
+    _render_plot(pd.read_csv(csv_file_name), plot_file_name, x, y, hue, y_title, xticklabels_rotation)
+
+
+## Batch plots
+#  `generate_plots` renders a list of plot specs in a process pool with the
+#  non interactive Agg backend. A spec is a dict with the arguments of
+#  `generate_plot`, but the data is given in memory as DataFrame under
+#  "data" instead of a csv file. The hash of the data and the arguments is
+#  stored next to the plot ('.<plot file name>.sha1') and plots whose hash
+#  did not change are skipped.
+def _plot_hash(spec):
+    import pandas as pd
+    df = spec["data"]
+    h = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    h.update(repr(list(df.columns)).encode())
+    h.update(repr(sorted((k, v) for k, v in spec.items() if k != "data")).encode())
+    return h.hexdigest()
+
+
+def _plot_hash_file(plot_file_name):
+    return path.join(path.dirname(plot_file_name), "." + path.basename(plot_file_name) + ".sha1")
+
+
+def _plot_worker_init():
+    import matplotlib
+    matplotlib.use("Agg", force=True)
+
+
+def _plot_worker(spec, digest):
+    ## Runs in the process pool.
+    _render_plot(spec["data"], spec["plot_file_name"], spec["x"], spec["y"], spec.get("hue"),
+                 spec.get("y_title", spec["y"]), spec.get("xticklabels_rotation", 90))
+    with open(_plot_hash_file(spec["plot_file_name"]), "w") as f:
+        f.write(digest)
+
+
+def generate_plots(specs, workers=1, force=False):
+    ## Returns the plot file names that were rendered. With `force` all
+    #  plots are rendered. Failing plots are reported and skipped.
+    todo = []
+    for spec in specs:
+        digest = _plot_hash(spec)
+        try:
+            with open(_plot_hash_file(spec["plot_file_name"])) as f:
+                unchanged = f.read() == digest and path.isfile(spec["plot_file_name"])
+        except OSError:
+            unchanged = False
+        if force or not unchanged:
+            todo.append((spec, digest))
+    if not todo:
+        return []
+
+    rendered = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(todo)),
+                                                initializer=_plot_worker_init) as executor:
+        futures = [executor.submit(_plot_worker, spec, digest) for spec, digest in todo]
+        for (spec, _), future in zip(todo, futures):
+            try:
+                future.result()
+                rendered.append(spec["plot_file_name"])
+            except Exception as e:
+                print("{}: {}".format(spec["plot_file_name"], e))
+    return rendered
+
+
+## Command line
+#  python -m gem5_utils summarize RESULTS --metrics cpi,ipc,mpki --format csv
+#  Prints one row per output directory below RESULTS with the run
+#  parameters and the metrics of the measured dump. The rows are kept in a
+#  results catalog so only new or changed directories are loaded again.
+def _summary_metrics(names):
+    ## Metric names, stat names or expressions. A prefix of metric names
+    #  like 'mpki' selects all of them (mpki_l1i, mpki_l1d, ...).
+    metrics = []
+    for name in names:
+        group = sorted(m for m in _METRICS if m.startswith(name + "_"))
+        metrics += [name] if name in _METRICS or not group else group
+    return metrics
+
+
+def summarize(result_dir, metrics, dump=0, workers=1, catalog_file=None):
+    ## DataFrame of the `metrics` of all output directories below `result_dir`.
+    #  The default dump 0 holds the measured invocations, gem5 appends another
+    #  dump with the rest of the simulation when it exits. Runs with per
+    #  invocation dumps are reported with a warning.
+    import results_catalog
+    result_dir = path.abspath(result_dir)
+    if catalog_file is None:
+        cache_dir = path.join(stats_cache_dir() or tempfile.gettempdir(), "catalogs")
+        os.makedirs(cache_dir, exist_ok=True)
+        catalog_file = path.join(cache_dir, "summary-{}.db".format(
+            hashlib.sha1("{}:{}".format(result_dir, dump).encode()).hexdigest()))
+
+    metrics = list(dict.fromkeys(metrics))
+    results_catalog.ingest_catalog(catalog_file, result_dir, metrics, dump, workers)
+    df = results_catalog.query_catalog(catalog_file, "outdir = ? OR outdir LIKE ?",
+                                       (result_dir, path.join(result_dir, "%")), metrics)
+    df.insert(0, "run", [path.relpath(d, result_dir) for d in df.outdir])
+    ## With `--dump-stats invocation` there is one dump per invocation plus
+    #  the exit dump, a single dump only covers part of the measurement.
+    per_invocation = df.run[df.num_dumps > 2]
+    if len(per_invocation):
+        print("Warning: {} runs have per invocation dumps (e.g. {}), dump {} is a single "
+              "invocation. Use invocation_stats for them.".format(
+                  len(per_invocation), per_invocation.iloc[0], dump), file=sys.stderr)
+    return df[["run", "function", "system", "cpu_model", "mode", "atomic_warming",
+               "num_invocations"] + list(metrics)]
+
+
+def parse_arguments(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m gem5_utils", description="gem5 results analysis")
+    commands = parser.add_subparsers(dest="command", required=True)
+    summary = commands.add_parser("summarize", help="Table of metrics for a results folder")
+    summary.add_argument("dir", type=str, help="Results directory")
+    summary.add_argument("--metrics", type=str, default="cpi,ipc,mpki",
+                         help="Comma separated metrics, stat names or expressions")
+    summary.add_argument("--define", type=str, action="append", default=[], metavar="NAME=EXPR",
+                         help="Define an additional metric")
+    summary.add_argument("--format", type=str, default="csv", choices=["csv", "parquet", "json"])
+    summary.add_argument("-o", "--output", type=str, default="-", help="Output file (default stdout)")
+    summary.add_argument("--dump", type=int, default=0, help="Dump to use (default: 0, the measurement)")
+    summary.add_argument("--workers", type=int, default=os.cpu_count(),
+                         help="Processes loading the results")
+    summary.add_argument("--catalog", type=str,
+                         help="Results catalog to use (default: one per results folder in the stats cache)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    for definition in args.define:
+        name, _, expr = definition.partition("=")
+        metric(name.strip(), expr.strip())
+    metrics = _summary_metrics([m.strip() for m in args.metrics.split(",") if m.strip()])
+    ## Diagnostics of the loaders go to stderr, stdout is for the table.
+    with contextlib.redirect_stdout(sys.stderr):
+        df = summarize(args.dir, metrics, args.dump, args.workers, args.catalog)
+
+    output = sys.stdout.buffer if args.output == "-" else args.output
+    try:
+        if args.format == "csv":
+            df.to_csv(sys.stdout if args.output == "-" else output, index=False)
+        elif args.format == "json":
+            df.to_json(output, orient="records", indent=2)
+        else:
+            df.to_parquet(output, index=False)
+    except ImportError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    ## Run the functions of the imported module so that metrics defined
+    #  here are seen by the catalog workers.
+    import gem5_utils
+    sys.exit(gem5_utils.main())
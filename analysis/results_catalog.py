@@ -0,0 +1,316 @@
+# MIT License
+#
+# Copyright (c) 2022 David Schall and EASE lab
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+## Results catalog
+#  A SQLite file with one row per gem5 output directory holding the run
+#  parameters from the command line in gem5.log, the CPU model and the
+#  headline metrics. `ingest_catalog` only looks at output directories whose
+#  stats.txt/gem5.log changed since the last time, `query_catalog` answers
+#  from the database alone without touching the results tree.
+
+import argparse
+import concurrent.futures
+import contextlib
+import hashlib
+import io
+import os
+import shlex
+import sqlite3
+import sys
+import time
+from os import path
+
+import numpy as np
+import pandas as pd
+
+import gem5_utils as gu
+
+DEFAULT_METRICS = ("cpi", "ipc", "mpki_l1i", "mpki_l1d")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    outdir TEXT PRIMARY KEY,
+    function TEXT,
+    system TEXT,
+    cpu_model TEXT,
+    mode TEXT,
+    atomic_warming INTEGER,
+    num_invocations INTEGER,
+    kernel TEXT,
+    kernel_hash TEXT,
+    disk TEXT,
+    disk_hash TEXT,
+    sim_seconds REAL,
+    host_seconds REAL,
+    num_dumps INTEGER,
+    command_line TEXT,
+    fingerprint TEXT,
+    ingested REAL
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    outdir TEXT REFERENCES runs(outdir) ON DELETE CASCADE,
+    name TEXT,
+    value REAL,
+    formula TEXT,
+    PRIMARY KEY (outdir, name)
+);
+CREATE INDEX IF NOT EXISTS runs_function ON runs(function);
+CREATE INDEX IF NOT EXISTS metrics_name ON metrics(name, value);
+"""
+
+_RUN_COLUMNS = ("outdir", "function", "system", "cpu_model", "mode", "atomic_warming",
+                "num_invocations", "kernel", "kernel_hash", "disk", "disk_hash",
+                "sim_seconds", "host_seconds", "num_dumps", "command_line", "fingerprint", "ingested")
+
+
+def _run_sim_arguments():
+    ## The options of the run_sim templates that describe a run. Defaults are
+    #  the ones of run_sim.tmpl.py. Abbreviations like `--num-invocation`
+    #  are accepted just like gem5 does.
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--kernel", type=str)
+    parser.add_argument("--disk", type=str)
+    parser.add_argument("-f", "--function", type=str, default="")
+    parser.add_argument("--system", type=str, default="simple")
+    parser.add_argument("--atomic-warming", type=int, default=0)
+    parser.add_argument("--num-invocations", type=int, default=5)
+    parser.add_argument("--mode", type=str, default="setup")
+    return parser
+
+
+def parse_command_line(cmd):
+    ## Run parameters from the `command line:` of gem5.log. Only the options
+    #  after the config script are parsed, the gem5 options before are ignored.
+    try:
+        tokens = shlex.split(cmd)
+    except ValueError:
+        tokens = cmd.split()
+    script = next((i for i, t in enumerate(tokens) if t.endswith(".py")), len(tokens) - 1)
+    args, _ = _run_sim_arguments().parse_known_args(tokens[script + 1:])
+    return vars(args)
+
+
+def _read_command_line(result_dir):
+    ## The command line is printed in the first lines of gem5.log.
+    if gu.find_result_file(result_dir, "gem5.log") is None:
+        return None
+    with io.TextIOWrapper(gu.open_result_file(result_dir, "gem5.log"), errors="replace") as f:
+        for _, line in zip(range(100), f):
+            if line[:14] == "command line: ":
+                return line[14:].strip()
+    return None
+
+
+def _fingerprint(result_dir):
+    ## Changes whenever one of the files the catalog row is built from changes.
+    parts = []
+    for name in ("stats.txt", "gem5.log", "config.ini"):
+        filename = gu.find_result_file(result_dir, name)
+        if filename is not None:
+            st = os.stat(filename)
+            parts.append("{}:{}:{}".format(path.basename(filename), st.st_size, st.st_mtime_ns))
+    return "|".join(parts)
+
+
+def _file_hash(filename):
+    ## Kernels and disk images are GBs in size. Like the stats cache we hash
+    #  the size and the first and last MiB which tells images apart reliably.
+    chunk = 1 << 20
+    size = os.stat(filename).st_size
+    h = hashlib.sha1(str(size).encode())
+    with open(filename, "rb") as f:
+        h.update(f.read(chunk))
+        if size > chunk:
+            f.seek(max(chunk, size - chunk))
+            h.update(f.read(chunk))
+    return h.hexdigest()
+
+
+def _find_input_file(result_dir, filename):
+    ## Kernel and disk are given relative to the working directory the
+    #  simulation was started from which is one of the parents of the outdir.
+    if filename is None:
+        return None
+    if path.isabs(filename):
+        return filename if path.isfile(filename) else None
+    parent = path.abspath(result_dir)
+    while True:
+        candidate = path.join(parent, filename)
+        if path.isfile(candidate):
+            return candidate
+        if path.dirname(parent) == parent:
+            return None
+        parent = path.dirname(parent)
+
+
+def _catalog_row(result_dir, metrics, dump):
+    ## Builds the catalog entry of one output directory. Runs in the process pool.
+    cmd = _read_command_line(result_dir)
+    run = parse_command_line(cmd) if cmd else {}
+    config = gu.read_config_ini(result_dir) or {}
+    row = {
+        "outdir": path.abspath(result_dir),
+        "function": run.get("function") or None,
+        "system": run.get("system"),
+        "cpu_model": config.get("system.cpu1.type"),
+        "mode": run.get("mode"),
+        "atomic_warming": run.get("atomic_warming"),
+        "num_invocations": run.get("num_invocations"),
+        "kernel": _find_input_file(result_dir, run.get("kernel")) or run.get("kernel"),
+        "disk": _find_input_file(result_dir, run.get("disk")) or run.get("disk"),
+        "command_line": cmd,
+    }
+
+    ## Runs without stats (failed or still running) get NULL metrics, so
+    #  they are not loaded again until their files change.
+    values = dict.fromkeys(metrics)
+    stat_names = sorted({name for m in metrics for name in gu.expression_stats(m)})
+    stats = gu.find_stats(result_dir, dump=dump, keys=stat_names + ["simSeconds", "hostSeconds"])
+    if stats is not None:
+        row["sim_seconds"] = stats.get("simSeconds")
+        row["host_seconds"] = stats.get("hostSeconds")
+        row["num_dumps"] = len(gu.index_stats(result_dir))
+        result_set = gu.ResultSet([gu.ExperimentResults(None, [gu.ExperimentStats(stats)], {})])
+        for m in metrics:
+            value = float(result_set.evaluate(m)[0])
+            values[m] = None if np.isnan(value) else value
+    return row, values
+
+
+def _catalog_row_quiet(result_dir, metrics, dump):
+    ## The loaders print their diagnostics, keep them off stdout which may
+    #  hold a table (`python -m gem5_utils summarize > table.csv`).
+    with contextlib.redirect_stdout(sys.stderr):
+        return _catalog_row(result_dir, metrics, dump)
+
+
+def _result_dirs(result_dir):
+    ## Every directory below `result_dir` with a stats file is an outdir.
+    for root, dirs, _ in os.walk(result_dir):
+        dirs.sort()
+        if gu.find_result_file(root, "stats.txt") or gu.find_result_file(root, "gem5.log"):
+            yield root
+
+
+def open_catalog(catalog_file):
+    db = sqlite3.connect(catalog_file)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA foreign_keys=ON")
+    db.executescript(_SCHEMA)
+    ## Catalogs written by older versions lack some columns.
+    for table, column, kind in (("runs", "num_dumps", "INTEGER"), ("metrics", "formula", "TEXT")):
+        if column not in [c[1] for c in db.execute("PRAGMA table_info({})".format(table))]:
+            db.execute("ALTER TABLE {} ADD COLUMN {} {}".format(table, column, kind))
+    return db
+
+
+def ingest_catalog(catalog_file, result_dir, metrics=DEFAULT_METRICS, dump=0, workers=1):
+    ## Adds all output directories below `result_dir` to the catalog. Output
+    #  directories that did not change since the last ingestion and already
+    #  have all `metrics` are skipped, the ones that no longer exist are
+    #  removed. Each metric is stored with its expanded formula, a metric
+    #  that was redefined with `metric()` is computed again. Returns the
+    #  number of (re)ingested runs.
+    metrics = list(metrics)
+    formulas = {m: gu.expand_metrics(m) for m in metrics}
+    db = open_catalog(catalog_file)
+    known = {outdir: fingerprint for outdir, fingerprint in
+             db.execute("SELECT outdir, fingerprint FROM runs")}
+    have = {}
+    for outdir, name, formula in db.execute("SELECT outdir, name, formula FROM metrics"):
+        have.setdefault(outdir, {})[name] = formula
+
+    todo, found = [], set()
+    for d in _result_dirs(result_dir):
+        outdir, fingerprint = path.abspath(d), _fingerprint(d)
+        found.add(outdir)
+        stored = have.get(outdir, {})
+        if known.get(outdir) != fingerprint or any(stored.get(m) != f for m, f in formulas.items()):
+            todo.append((outdir, fingerprint))
+
+    rows = []
+    args = [(outdir, metrics, dump) for outdir, _ in todo]
+    if workers > 1 and len(todo) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_catalog_row_quiet, *a) for a in args]
+            for (outdir, fingerprint), future in zip(todo, futures):
+                try:
+                    rows.append((fingerprint,) + future.result())
+                except Exception as e:
+                    print("{}: {}".format(outdir, e), file=sys.stderr)
+    else:
+        for (outdir, fingerprint), a in zip(todo, args):
+            try:
+                rows.append((fingerprint,) + _catalog_row_quiet(*a))
+            except Exception as e:
+                print("{}: {}".format(outdir, e), file=sys.stderr)
+
+    ## Output directories below `result_dir` that were deleted since.
+    root = path.abspath(result_dir)
+    vanished = [(outdir,) for outdir in known if outdir not in found and
+                (outdir == root or outdir.startswith(path.join(root, "")))]
+
+    ## All runs share a handful of kernels and disks. Hash each one once.
+    hashes = {}
+    now = time.time()
+    with db:
+        db.executemany("DELETE FROM metrics WHERE outdir = ?", vanished)
+        db.executemany("DELETE FROM runs WHERE outdir = ?", vanished)
+        for fingerprint, row, values in rows:
+            for name in ("kernel", "disk"):
+                filename = row[name]
+                if filename and filename not in hashes:
+                    hashes[filename] = _file_hash(filename) if path.isfile(filename) else None
+                row[name + "_hash"] = hashes.get(filename)
+            row["fingerprint"] = fingerprint
+            row["ingested"] = now
+            ## Metrics of an older version of the run are stale.
+            if known.get(row["outdir"], fingerprint) != fingerprint:
+                db.execute("DELETE FROM metrics WHERE outdir = ?", (row["outdir"],))
+            db.execute("INSERT INTO runs ({}) VALUES ({}) ON CONFLICT(outdir) DO UPDATE SET {}".format(
+                ", ".join(_RUN_COLUMNS), ", ".join("?" * len(_RUN_COLUMNS)),
+                ", ".join("{0} = excluded.{0}".format(c) for c in _RUN_COLUMNS[1:])),
+                [row.get(c) for c in _RUN_COLUMNS])
+            db.executemany("INSERT OR REPLACE INTO metrics (outdir, name, value, formula) VALUES (?, ?, ?, ?)",
+                           [(row["outdir"], name, value, formulas[name]) for name, value in values.items()])
+    db.close()
+    return len(rows)
+
+
+def query_catalog(catalog_file, where="", params=(), metrics=None):
+    ## Runs matching the SQL condition `where` (over the columns of the runs
+    #  table) as DataFrame with one additional column per metric, e.g.
+    #  query_catalog(f, "function = ? AND cpu_model = 'DerivO3CPU'
+    #                    AND atomic_warming >= ?", ("aes-go", 10))
+    #  `metrics` defaults to all metrics in the catalog.
+    db = open_catalog(catalog_file)
+    if metrics is None:
+        metrics = [name for name, in db.execute("SELECT DISTINCT name FROM metrics ORDER BY name")]
+    columns = ", ".join(["r.*"] + ["m{0}.value AS \"{1}\"".format(i, m.replace('"', '""'))
+                                   for i, m in enumerate(metrics)])
+    joins = " ".join("LEFT JOIN metrics m{0} ON m{0}.outdir = r.outdir AND m{0}.name = ?".format(i)
+                     for i in range(len(metrics)))
+    query = "SELECT {} FROM (SELECT * FROM runs{}) r {} ORDER BY r.outdir".format(
+        columns, " WHERE " + where if where else "", joins)
+    df = pd.read_sql_query(query, db, params=list(params) + list(metrics))
+    db.close()
+    return df
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+## Synthetic gem5 results
+#  Writes results trees that look like the output of the run_sim scripts:
+#  one directory per run with stats.txt (several dumps with scalar, vector
+#  and distribution stats), config.json, config.ini and gem5.log. They are
+#  used by benchmark_analysis.py to measure the analysis layer without
+#  running gem5. The content only depends on the seed.
+#
+#  python3 synthetic_results.py <dir> --runs 32 --dumps 20 --keys 5000
+
+import argparse
+import json
+import os
+import random
+from os import path
+
+
+FUNCTIONS = ["fibonacci-go", "fibonacci-python", "aes-go", "aes-nodejs",
+             "auth-go", "auth-python", "online-shop-cart", "hotel-app-geo"]
+CACHES = ["icache", "dcache", "l2cache"]
+CPU_STATS = ["numCycles", "numInsts", "numOps", "idleCycles", "quiesceCycles",
+             "committedInsts", "committedOps", "numFetchSuspends"]
+CACHE_STATS = ["overallHits::total", "overallMisses::total", "overallAccesses::total",
+               "overallMshrMisses::total", "demandHits::total", "demandMisses::total",
+               "writebacks::writebacks", "replacements"]
+PIPELINE = ["fetch", "decode", "rename", "iew", "commit", "lsq0", "branchPred", "rob"]
+
+
+def _line(key, value, desc="Synthetic stat", unit="Count"):
+    return "{:<60} {:>20} # {} ({})\n".format(key, value, desc, unit)
+
+
+def _distribution(rnd, name, buckets=10, samples=None):
+    ## Lines of a gem5 distribution with buckets 0..buckets-1.
+    counts = [rnd.randint(0, 10000) for _ in range(buckets)]
+    samples = sum(counts) if samples is None else samples
+    mean = sum(i * c for i, c in enumerate(counts)) / max(samples, 1)
+    lines = [_line(name + "::samples", samples),
+             _line(name + "::mean", "{:.6f}".format(mean)),
+             _line(name + "::stdev", "{:.6f}".format(rnd.random() * 3)),
+             "{:<60} {:>20} {:>10} {:>10} # Synthetic stat (Count)\n".format(
+                 name + "::underflows", 0, "0.00%", "0.00%")]
+    cum = 0
+    for i, c in enumerate(counts):
+        pdf = 100. * c / max(samples, 1)
+        cum += pdf
+        lines.append("{:<60} {:>20} {:>9.2f}% {:>9.2f}% # Synthetic stat (Count)\n".format(
+            "{}::{}".format(name, i), c, pdf, cum))
+    lines += ["{:<60} {:>20} {:>10} {:>10} # Synthetic stat (Count)\n".format(
+                  name + "::overflows", 0, "0.00%", "{:.2f}%".format(cum)),
+              _line(name + "::min_value", 0), _line(name + "::max_value", buckets - 1),
+              _line(name + "::total", samples)]
+    return lines
+
+
+def _stat_names(keys, distributions):
+    ## The scalar stat names and distribution names of a run. The fixed
+    #  part mirrors the skylake system, the rest fills up to `keys` lines.
+    scalars, dists = [], []
+    for c in range(2):
+        cpu = "system.cpu{}".format(c)
+        scalars += [cpu + "." + s for s in CPU_STATS]
+        scalars += [cpu + ".exec_context.thread_0.numInsts", cpu + ".ipc", cpu + ".cpi"]
+        for cache in CACHES:
+            scalars += ["{}.{}.{}".format(cpu, cache, s) for s in CACHE_STATS]
+            scalars += ["{}.{}.overallMissRate::total".format(cpu, cache)]
+    scalars += ["system.l3cache." + s for s in CACHE_STATS]
+    scalars += ["system.l3cache.overallMissRate::total"]
+    for i in range(distributions):
+        dists.append("system.cpu{}.{}.dist{}".format(i % 2, PIPELINE[i % len(PIPELINE)], i))
+    k = 0
+    while len(scalars) + 16 * len(dists) < keys:
+        scalars.append("system.cpu{}.{}.stat{}".format(k % 2, PIPELINE[k % len(PIPELINE)], k))
+        k += 1
+    return scalars, dists
+
+
+def _dump(rnd, scalars, dists):
+    insts = [rnd.randint(10 ** 6, 10 ** 7) for _ in range(2)]
+    cycles = [int(i * rnd.uniform(0.5, 4.0)) for i in insts]
+    host = rnd.uniform(1, 100)
+    lines = ["\n---------- Begin Simulation Statistics ----------\n",
+             _line("simSeconds", "{:.6f}".format(max(cycles) / 3e9), "Number of seconds simulated", "Second"),
+             _line("simTicks", max(cycles) * 333, "Number of ticks simulated", "Tick"),
+             _line("hostSeconds", "{:.2f}".format(host), "Real time elapsed on the host", "Second"),
+             _line("hostInstRate", int(sum(insts) / host), "Simulator instruction rate", "Count/Second")]
+    for key in scalars:
+        cpu = 1 if key.startswith("system.cpu1") else 0
+        if key.endswith(("numInsts", "committedInsts")):
+            value = insts[cpu]
+        elif key.endswith("numCycles"):
+            value = cycles[cpu]
+        elif key.endswith(".ipc"):
+            value = "{:.6f}".format(insts[cpu] / cycles[cpu])
+        elif key.endswith(".cpi"):
+            value = "{:.6f}".format(cycles[cpu] / insts[cpu])
+        elif "MissRate" in key:
+            value = "{:.6f}".format(rnd.random() * 0.2)
+        else:
+            value = rnd.randint(0, insts[cpu] // 10)
+        lines.append(_line(key, value))
+    for name in dists:
+        lines += _distribution(rnd, name)
+    lines.append("\n---------- End Simulation Statistics   ----------\n")
+    return lines
+
+
+def _config(rnd, cpu_model):
+    ## config.json and config.ini of the skylake system.
+    cpus = []
+    for c in range(2):
+        caches = {cache: {"type": "Cache", "name": cache, "path": "system.cpu{}.{}".format(c, cache),
+                          "size": rnd.choice([32768, 65536]) if cache != "l2cache" else 1048576,
+                          "assoc": 8, "tag_latency": rnd.choice([1, 2, 4])} for cache in CACHES}
+        cpus.append(dict(type=cpu_model if c else "AtomicSimpleCPU", name="cpu{}".format(c),
+                         path="system.cpu{}".format(c), numROBEntries=224, **caches))
+    system = {"type": "System", "name": "system", "path": "system", "cpu": cpus,
+              "l3cache": {"type": "Cache", "name": "l3cache", "path": "system.l3cache",
+                          "size": 2097152, "assoc": 16},
+              "mem_ranges": ["0:2147483648"], "clk_domain": {"clock": [333]}}
+    config = {"type": "Root", "name": None, "full_system": True, "system": system}
+
+    ini = []
+
+    def section(node, name):
+        values = {k: v for k, v in node.items() if not isinstance(v, (dict, list))}
+        ini.append("[{}]\n".format(name))
+        ini.extend("{}={}\n".format(k, "true" if v is True else "false" if v is False else v)
+                   for k, v in values.items() if k not in ("name", "path"))
+        ini.append("\n")
+        for k, v in node.items():
+            if isinstance(v, dict):
+                section(v, name + "." + k)
+            elif isinstance(v, list) and v and isinstance(v[0], dict):
+                for child in v:
+                    section(child, name + "." + child["name"])
+
+    section(system, "system")
+    return config, "".join(ini)
+
+
+def generate_run(outdir, dumps=1, keys=3000, distributions=20, seed=0, function="fibonacci-go",
+                 cpu_model="O3CPU", warming=10, invocations=20):
+    ## Writes one synthetic gem5 output directory.
+    rnd = random.Random("{}:{}".format(seed, outdir))
+    os.makedirs(outdir, exist_ok=True)
+    scalars, dists = _stat_names(keys, distributions)
+    with open(path.join(outdir, "stats.txt"), "w") as f:
+        for _ in range(dumps):
+            f.writelines(_dump(rnd, scalars, dists))
+
+    config, ini = _config(rnd, cpu_model)
+    with open(path.join(outdir, "config.json"), "w") as f:
+        json.dump(config, f, indent=4)
+    with open(path.join(outdir, "config.ini"), "w") as f:
+        f.write(ini)
+
+    with open(path.join(outdir, "gem5.log"), "w") as f:
+        f.write("gem5 Simulator System.  https://www.gem5.org\n")
+        f.write("command line: build/X86/gem5.opt --outdir={} run_sim.py --kernel kernel "
+                "--disk disk.img --function {} --mode=evaluation --system skylake "
+                "--atomic-warming {} --num-invocations {}\n".format(outdir, function, warming, invocations))
+        for i in range(warming + invocations):
+            f.write("Start invokation: {}\n".format(i))
+            f.write("End invokation: {}\n".format(i))
+        f.write(" Measuring done\n Simulation done.\n")
+
+
+def generate_results(result_dir, runs=8, dumps=1, keys=3000, distributions=20, seed=0):
+    ## A results tree with `runs` output directories, named like the
+    #  directories of sim_all_functions.sh.
+    outdirs = []
+    for i in range(runs):
+        function = FUNCTIONS[i % len(FUNCTIONS)]
+        outdir = path.join(result_dir, "{}-{}".format(function, i // len(FUNCTIONS)))
+        generate_run(outdir, dumps, keys, distributions, seed, function,
+                     cpu_model="O3CPU" if i % 2 == 0 else "TimingSimpleCPU")
+        outdirs.append(outdir)
+    return outdirs
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Write a synthetic gem5 results tree")
+    parser.add_argument("dir", type=str, help="Results directory")
+    parser.add_argument("--runs", type=int, default=8, help="Number of output directories")
+    parser.add_argument("--dumps", type=int, default=1, help="Stats dumps per run")
+    parser.add_argument("--keys", type=int, default=3000, help="Stats lines per dump")
+    parser.add_argument("--distributions", type=int, default=20, help="Distributions per dump")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    generate_results(args.dir, args.runs, args.dumps, args.keys, args.distributions, args.seed)
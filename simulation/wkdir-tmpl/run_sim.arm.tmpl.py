@@ -40,6 +40,7 @@ scons build/ARM/gem5.opt -j<NUM_CPUS>
 """
 import m5
 from m5.objects import (
+    Root,
     Armv83,
     ArmDefaultRelease,
     VExpress_GEM5_V1,
@@ -89,11 +90,23 @@ def parse_arguments():
                                 do some """)
     parser.add_argument("--checkpoint-dir", type = str, default="checkpoints/",
                         help = "Directory of")
+    parser.add_argument("--stats-format", type=str, default="text", choices=["text", "hdf5",],
+                        help="""text: Write the stats only to stats.txt.
+                                hdf5: Additionally write them to stats.h5. Requires gem5
+                                to be built with HDF5 support.""")
+    parser.add_argument("--stats-groups", type=str, default="",
+                        help="""Comma separated SimObjects (e.g. board.processor,board.cache_hierarchy)
+                                whose subtrees are dumped. Default: dump all stats.
+                                The final dump gem5 writes at exit is not restricted.""")
     return parser.parse_args()
 
 
 args = parse_arguments()
 
+if args.stats_format == "hdf5":
+    # One row per stats dump in stats.h5 in the output directory
+    m5.stats.addStatVisitor("h5://stats.h5")
+
 if args.mode == "setup":
     Path("{}/{}".format(args.checkpoint_dir, args.function)).mkdir(parents=True, exist_ok=True)
 
@@ -223,6 +236,24 @@ m5 --addr=0x10010000 exit ## 6: Test done
 """
 
 
+stats_roots = None
+
+def dumpStats():
+    ## Dump all stats or only the subtrees given with --stats-groups.
+    global stats_roots
+    if not args.stats_groups:
+        m5.stats.dump()
+        return
+    if stats_roots is None:
+        objs = {obj.path(): obj for obj in Root.getInstance().descendants()}
+        groups = [g for g in args.stats_groups.split(",") if g]
+        missing = [g for g in groups if g not in objs]
+        if missing:
+            m5.util.fatal("Unknown stats groups: {}".format(", ".join(missing)))
+        stats_roots = [objs[g] for g in groups]
+    m5.stats.dump(roots=stats_roots)
+
+
 def workbegin() -> bool:
     print("Begin")
     return False
@@ -260,7 +291,7 @@ def executeExit() -> bool:
 
     else:
         print("Simulation done")
-        m5.stats.dump()
+        dumpStats()
         m5.exit()
 
 
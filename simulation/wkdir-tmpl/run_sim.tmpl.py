@@ -69,6 +69,18 @@ def parse_arguments():
                                 boot: taken after booting. warm: taken after functional warming.""")
     parser.add_argument("--checkpoint-dir", type = str, default="cpt_1m/",
                         help = "Directory of")
+    parser.add_argument("--stats-format", type=str, default="text", choices=["text", "hdf5",],
+                        help="""text: Write the stats only to stats.txt.
+                                hdf5: Additionally write them to stats.h5. Requires gem5
+                                to be built with HDF5 support.""")
+    parser.add_argument("--dump-stats", type=str, default="end", choices=["end", "invocation",],
+                        help="""end: Dump the stats once after all measured invocations.
+                                invocation: Reset the stats when a measured invocation begins
+                                and dump them when it ends. Dump i holds invocation i.""")
+    parser.add_argument("--stats-groups", type=str, default="",
+                        help="""Comma separated SimObjects (e.g. system.cpu1,system.l3cache)
+                                whose subtrees are dumped. Default: dump all stats.
+                                The final dump gem5 writes at exit is not restricted.""")
     return parser.parse_args()
 
 
@@ -156,6 +168,24 @@ FAIL_CODES = {
 inv_to_warm = -1
 inv_to_measure = -1
 
+stats_roots = None
+
+def dumpStats():
+    ## Dump all stats or only the subtrees given with --stats-groups.
+    global stats_roots
+    if not args.stats_groups:
+        m5.stats.dump()
+        return
+    if stats_roots is None:
+        objs = {obj.path(): obj for obj in Root.getInstance().descendants()}
+        groups = [g for g in args.stats_groups.split(",") if g]
+        missing = [g for g in groups if g not in objs]
+        if missing:
+            m5.util.fatal("Unknown stats groups: {}".format(", ".join(missing)))
+        stats_roots = [objs[g] for g in groups]
+    m5.stats.dump(roots=stats_roots)
+
+
 def workitem(begin, id):
     global inv_to_warm,inv_to_measure
     id -= 100
@@ -174,8 +204,8 @@ def workitem(begin, id):
             inv_to_warm = -1
             m5.stats.reset()
 
-        # if inv_to_measure > 0:
-        #     m5.stats.reset()
+        if inv_to_measure > 0 and args.dump_stats == "invocation":
+            m5.stats.reset()
 
     else:
         prYellow(f"End invokation: {id}")
@@ -185,12 +215,14 @@ def workitem(begin, id):
             return
 
         if inv_to_measure > 0:
-            # m5.stats.dump()
+            if args.dump_stats == "invocation":
+                dumpStats()
             inv_to_measure -= 1
 
         if inv_to_measure == 0:
             prGreen("Measuring done")
-            m5.stats.dump()
+            if args.dump_stats == "end":
+                dumpStats()
             return True
 
 
@@ -249,6 +281,10 @@ if __name__ == "__m5_main__":
 
     args = parse_arguments()
 
+    if args.stats_format == "hdf5":
+        # One row per stats dump in stats.h5 in the output directory
+        m5.stats.addStatVisitor("h5://stats.h5")
+
     if args.take_checkpoints or args.mode == "setup":
         Path("{}/{}".format(args.checkpoint_dir, args.function)).mkdir(parents=True, exist_ok=True)
 